@@ -1,30 +1,32 @@
 import os
 import streamlit as st
-import tempfile
-from PIL import Image
 from io import BytesIO
 import sys
 import base64
-import time
-import random
-import re
+import hashlib
+import html
+import textwrap
 
 # Add the parent directory to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Fix imports - remove DeGhiblify prefix since we're already in that directory
-from src.openai_client import OpenAIClient
-from src.image_processor import ImageProcessor
+# Modules pulling in openai, PIL, NumPy or requests are imported where first used, so the page
+# renders before they load; once loaded they stay in sys.modules for every later run
+from src.cache import MemoryCache, create_result_cache, create_description_cache
+from src.phash_index import create_near_duplicate_index
+from src.result_store import create_result_store
+from src.metrics import start_metrics_server
 from src.utils import generate_output_filename, handle_api_error
-from config.settings import OPENAI_API_KEY, DEBUG_MODE
+from config.settings import (
+    OPENAI_API_KEY, DEBUG_MODE,
+    THUMBNAIL_FORMAT, THUMBNAIL_CACHE_ITEMS, RESULT_STORE_ENTRIES_PER_SESSION, JOB_POLL_SECONDS,
+    METRICS_ENABLED, METRICS_PORT, VARIANT_COUNT, OUTPUT_FORMAT, OUTPUT_QUALITY,
+)
 
 # Hide deployment configs
 st.set_option('client.showErrorDetails', False)
 
-# Create assets directory if it doesn't exist
-assets_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
-os.makedirs(assets_dir, exist_ok=True)
-
 # Configuration and page setup
 st.set_page_config(
     page_title="DeGhiblify",
@@ -33,10 +35,103 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Replace the animated particles (alternative approach if above doesn't work)
-def add_bg_animation():
-    """Add a simpler background animation that won't cause rendering issues"""
-    st.markdown("""
+# Create assets directory if it doesn't exist, once per process
+# (no spinner: module-level cached calls must not add elements of their own)
+@st.cache_resource(show_spinner=False)
+def get_assets_dir():
+    assets_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+    os.makedirs(assets_dir, exist_ok=True)
+    return assets_dir
+
+get_assets_dir()
+
+# Result cache shared by every session in this process
+@st.cache_resource
+def get_result_cache():
+    return create_result_cache()
+
+# Description cache shared by every session, used to re-roll portraits without a new vision call
+@st.cache_resource
+def get_description_cache():
+    return create_description_cache()
+
+# Perceptual hash index so re-saved or resized uploads hit the result cache
+@st.cache_resource
+def get_near_duplicate_index():
+    return create_near_duplicate_index()
+
+# Rate limiter shared by every session so the whole process stays within quota
+@st.cache_resource
+def get_rate_limiter():
+    from src.rate_limiter import create_rate_limiter
+    return create_rate_limiter()
+
+# Prometheus endpoint for per-stage timings and usage, started once per process
+@st.cache_resource
+def get_metrics_server():
+    return start_metrics_server(METRICS_PORT) if METRICS_ENABLED else None
+
+get_metrics_server()
+
+# Download encoder shared by every session, so each encoded format is cached process-wide
+@st.cache_resource
+def get_image_encoder():
+    from src.encoding import create_image_encoder
+    return create_image_encoder()
+
+# Labels for the download format selector
+OUTPUT_FORMAT_LABELS = {
+    "ORIGINAL": "Original (as generated)",
+    "WEBP": "WebP",
+    "AVIF": "AVIF",
+    "JPEG": "JPEG (progressive)",
+    "PNG": "PNG",
+}
+
+# Background workers shared by every session; their count caps concurrent transformations
+@st.cache_resource
+def get_job_queue():
+    from src.jobs import create_job_queue
+    return create_job_queue()
+
+def run_transformation(openai_client, source, original_name, original_digest, reroll=False, variants=0,
+                       progress=None):
+    """Transform an upload on a job worker, returning the result record. Must not call Streamlit."""
+    # Transform the image, generate a new take from the cached description, or fan out several takes
+    variant_images = []
+    if variants:
+        finished = dict(openai_client.generate_variants(source, count=variants, progress=progress))
+        variant_images = [finished[i] for i in sorted(finished) if not isinstance(finished[i], Exception)]
+        if not variant_images:
+            raise finished[0]
+        result_data = variant_images[0]
+    elif reroll:
+        description = openai_client.describe_image(source, progress=progress)
+        result_data = openai_client.generate_from_description(description, progress=progress)
+    else:
+        result_data = openai_client.deghiblify_image(source, progress=progress)
+    
+    payload = progress.vision_payload
+    return {
+        "original_name": original_name,
+        "original_digest": original_digest,
+        "original": bytes(source.data),
+        "description": progress.description,
+        "result": result_data,
+        "variants": variant_images,
+        "timings": dict(progress.timings),
+        "vision_payload": None if payload is None else {
+            "encoded_bytes": payload.encoded_bytes,
+            "bytes_saved": payload.bytes_saved,
+            "mime_type": payload.mime_type,
+            "tokens": payload.tokens,
+            "tokens_saved": payload.tokens_saved,
+            "crop_box": payload.crop_box,
+        },
+    }
+
+# Background animation: soft pulsing circles behind the page content
+BG_ANIMATION_HTML = """
     <style>
     @keyframes pulse {
         0% { transform: scale(1); opacity: 0.2; }
@@ -68,13 +163,10 @@ def add_bg_animation():
         <div class="bg-circle" style="--circle-color: rgba(139, 92, 246, 0.2); width: 400px; height: 400px; top: 60%; left: 75%; --duration: 12s; --delay: 2s;"></div>
         <div class="bg-circle" style="--circle-color: rgba(79, 70, 229, 0.2); width: 350px; height: 350px; top: 10%; left: 80%; --duration: 8s; --delay: 1s;"></div>
     </div>
-    """, unsafe_allow_html=True)
-
-# Use this simpler animation instead of the particle system
-add_bg_animation()
+    """
 
-# Apply dark mode styling
-st.markdown('''
+# Dark mode styling
+DARK_THEME_CSS = '''
 <style>
     /* Dark mode theme */
     @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap');
@@ -201,13 +293,10 @@ st.markdown('''
         box-shadow: 0 0 20px rgba(59, 130, 246, 0.3);
     }
 </style>
-''', unsafe_allow_html=True)
+'''
 
-# Define custom card component for dark mode
-def custom_card(content, title=None, key=None):
-    card_container = st.container()
-    with card_container:
-        st.markdown('''
+# Styles shared by every custom_card
+CARD_CSS = '''
         <style>
         .dark-card {
             background-color: #1e293b;
@@ -241,32 +330,24 @@ def custom_card(content, title=None, key=None):
             background: linear-gradient(90deg, #3b82f6, #8b5cf6);
         }
         </style>
-        ''', unsafe_allow_html=True)
-        
-        title_html = f'<div class="dark-card-title">{title}</div>' if title else ''
-        st.markdown(f'<div class="dark-card"><div class="dark-card-accent"></div>{title_html}{content}</div>', unsafe_allow_html=True)
-    return card_container
+        '''
 
-# Enhanced image card with before/after effects for dark mode
-def image_card(image, caption, type="before"):
-    img_bytes = BytesIO()
-    image.save(img_bytes, format='PNG')
-    img_base64 = base64.b64encode(img_bytes.getvalue()).decode()
-    
-    # Different styling for before vs after images
-    if type == "before":
-        card_color = "#3b82f6"
-        accent_gradient = "linear-gradient(90deg, #3b82f6, #60a5fa)"
-        badge_text = "ORIGINAL"
-        badge_color = "rgba(59, 130, 246, 0.9)"
-    else:
-        card_color = "#8b5cf6"
-        accent_gradient = "linear-gradient(90deg, #8b5cf6, #a78bfa)"
-        badge_text = "TRANSFORMED"
-        badge_color = "rgba(139, 92, 246, 0.9)"
-    
-    st.markdown(f'''
-    <style>
+# Before/after styling of image cards, formatted into the page styles
+IMAGE_CARD_THEMES = {
+    "before": {
+        "card_color": "#3b82f6",
+        "accent_gradient": "linear-gradient(90deg, #3b82f6, #60a5fa)",
+        "badge_color": "rgba(59, 130, 246, 0.9)",
+    },
+    "after": {
+        "card_color": "#8b5cf6",
+        "accent_gradient": "linear-gradient(90deg, #8b5cf6, #a78bfa)",
+        "badge_color": "rgba(139, 92, 246, 0.9)",
+    },
+}
+
+# Rules for one image card type; {type} and the IMAGE_CARD_THEMES colours are filled in per type
+IMAGE_CARD_CSS = '''
     .dark-img-card-{type} {{
         position: relative;
         background-color: #1e293b;
@@ -317,12 +398,111 @@ def image_card(image, caption, type="before"):
         color: #e2e8f0 !important;
         font-size: 1.05rem;
     }}
-    </style>
+'''
+
+# Every page-wide style in one element, built once per process; cards then only send their own markup
+@st.cache_resource(show_spinner=False)
+def get_page_styles():
+    image_card_css = "".join(
+        IMAGE_CARD_CSS.format(type=type, **theme) for type, theme in IMAGE_CARD_THEMES.items()
+    )
+    parts = [BG_ANIMATION_HTML, DARK_THEME_CSS, CARD_CSS, f"<style>{image_card_css}</style>"]
+    # st.markdown dedents its body as a whole, so each part is dedented on its own first
+    return "\n\n".join(textwrap.dedent(part).strip() for part in parts)
+
+st.markdown(get_page_styles(), unsafe_allow_html=True)
+
+# Define custom card component for dark mode
+def custom_card(content, title=None, key=None):
+    card_container = st.container()
+    with card_container:
+        title_html = f'<div class="dark-card-title">{title}</div>' if title else ''
+        st.markdown(f'<div class="dark-card"><div class="dark-card-accent"></div>{title_html}{content}</div>', unsafe_allow_html=True)
+    return card_container
+
+# Results of every session, held within a shared memory budget and spilled to disk
+@st.cache_resource
+def get_result_store():
+    return create_result_store()
+
+def save_session_result(record):
+    """Store a result for this session, dropping the session's oldest results beyond the limit."""
+    result_store = get_result_store()
+    entry_ids = st.session_state.setdefault("result_ids", [])
+    entry_ids.append(result_store.put(record))
+    while len(entry_ids) > RESULT_STORE_ENTRIES_PER_SESSION:
+        result_store.delete(entry_ids.pop(0))
+
+def get_session_result():
+    """Return this session's most recent result, or None."""
+    entry_ids = st.session_state.get("result_ids")
+    if not entry_ids:
+        return None
+    return get_result_store().get(entry_ids[-1])
+
+# Display thumbnails shared by every session, keyed by a digest of the full image bytes
+@st.cache_resource
+def get_thumbnail_cache():
+    return MemoryCache(max_items=THUMBNAIL_CACHE_ITEMS)
+
+def get_thumbnail(image_bytes, image=None, digest=None):
+    """
+    Return a display-sized thumbnail for encoded image bytes, encoding it only once per image.
+
+    image may be a decoded PIL Image or a SourceImage, which is only decoded on a cache miss.
+    """
+    key = digest or hashlib.sha256(image_bytes).hexdigest()
+    thumbnail_cache = get_thumbnail_cache()
+    thumbnail = thumbnail_cache.get(key)
+    if thumbnail is None:
+        from src.image_processor import ImageProcessor, SourceImage
+        if isinstance(image, SourceImage):
+            image = image.image
+        elif image is None:
+            image = ImageProcessor.load_image(BytesIO(image_bytes))
+        thumbnail = ImageProcessor.make_thumbnail(image)
+        thumbnail_cache.set(key, thumbnail)
+    return thumbnail
+
+def get_crop_overlay(image_bytes, digest, crop_box):
+    """Return a thumbnail of the original image with the vision crop outlined, drawn only once per image and box."""
+    key = f"{digest}:{tuple(crop_box)}"
+    thumbnail_cache = get_thumbnail_cache()
+    thumbnail = thumbnail_cache.get(key)
+    if thumbnail is None:
+        from PIL import ImageOps
+        from src.image_processor import ImageProcessor
+        # Decoded with the same limits as the vision input, so the box coordinates line up
+        image = ImageOps.exif_transpose(ImageProcessor.load_image(BytesIO(image_bytes)))
+        thumbnail = ImageProcessor.make_thumbnail(ImageProcessor.draw_region_overlay(image, crop_box))
+        thumbnail_cache.set(key, thumbnail)
+    return thumbnail
+
+# Grid of variant thumbnails; slots for variants still generating show a placeholder
+def variant_grid(variants, total, columns=2):
+    for row_start in range(0, total, columns):
+        cols = st.columns(columns)
+        for index in range(row_start, min(row_start + columns, total)):
+            with cols[index - row_start]:
+                variant = variants.get(index)
+                if isinstance(variant, bytes):
+                    st.image(get_thumbnail(variant), use_column_width=True)
+                elif variant is None:
+                    st.markdown("<p style='text-align:center; color: #94a3b8 !important; padding: 40px 0;'>Generating...</p>", unsafe_allow_html=True)
+                else:
+                    st.markdown("<p style='text-align:center; color: #ef4444 !important; padding: 40px 0;'>This variation failed</p>", unsafe_allow_html=True)
+
+# Enhanced image card with before/after effects for dark mode
+def image_card(image_bytes, caption, type="before", image=None, digest=None):
+    img_base64 = base64.b64encode(get_thumbnail(image_bytes, image, digest)).decode()
+    img_mime = f"image/{THUMBNAIL_FORMAT.lower()}"
+    badge_text = "ORIGINAL" if type == "before" else "TRANSFORMED"
     
+    st.markdown(f'''
     <div class="dark-img-card-{type}">
         <div class="dark-accent-line-{type}"></div>
         <div class="dark-img-container-{type}">
-            <img src="data:image/png;base64,{img_base64}" style="width: 100%; display: block;" />
+            <img src="data:{img_mime};base64,{img_base64}" style="width: 100%; display: block;" />
             <div class="dark-img-badge-{type}">{badge_text}</div>
         </div>
         <div class="dark-img-caption-{type}">{caption}</div>
@@ -456,16 +636,56 @@ with col1:
     
     uploaded_file = st.file_uploader("Choose an image...", type=["jpg", "jpeg", "png"], label_visibility="collapsed")
     
+    if uploaded_file is not None:
+        from src.image_processor import ImageTooLarge, SourceImage
+        
+        # Wrap the upload's buffer once; display, hashing and the API calls share its decoded image
+        source = SourceImage.from_any(uploaded_file)
+        upload_digest = hashlib.sha256(source.data).hexdigest()
+        
+        try:
+            # Checks the byte size and the header's dimensions only; pixels are decoded for the
+            # thumbnail on its first render and for the vision call on the job worker
+            source.check_limits()
+        except ImageTooLarge as e:
+            st.markdown(f'''
+            <div style="background-color: rgba(239, 68, 68, 0.1); border-left: 3px solid #ef4444; padding: 15px; border-radius: 8px; margin-bottom: 20px;">
+                <p style="margin: 0; display: flex; align-items: center; color: #ef4444 !important;">
+                    <span style="margin-right: 10px; font-size: 1.2rem;">❌</span>
+                    {e} Please upload a smaller image.
+                </p>
+            </div>
+            ''', unsafe_allow_html=True)
+            uploaded_file = None
+    
     if uploaded_file is not None:
         # Display the uploaded image
-        image = Image.open(uploaded_file)
-        image_card(image, caption="Your Ghibli Character", type="before")
+        image_card(source.data, caption="Your Ghibli Character", type="before", image=source, digest=upload_digest)
+        
+        # One transformation per session at a time; the buttons come back once the job finishes
+        can_submit = bool(api_key and is_valid_key) and "job_id" not in st.session_state
         
         # Process button
         process_button = animated_button(
             "Transform to Human", 
             key="transform_btn", 
-            disabled=not (api_key and is_valid_key)
+            disabled=not can_submit
+        )
+        
+        # Re-roll button reuses the cached description and only generates a new portrait
+        reroll_button = animated_button(
+            "Generate Another Take",
+            key="reroll_btn",
+            is_primary=False,
+            disabled=not can_submit
+        )
+        
+        # Variations share one description and generate their portraits concurrently
+        variants_button = animated_button(
+            f"Generate {VARIANT_COUNT} Variations",
+            key="variants_btn",
+            is_primary=False,
+            disabled=not can_submit
         )
 
 with col2:
@@ -475,117 +695,217 @@ with col2:
     </p>
     ''', title="2. See the Human Transformation")
     
-    # Process the image when button is clicked
-    if uploaded_file is not None and 'process_button' in locals() and process_button:
-        # Create a single placeholder for status updates
-        progress_placeholder = st.empty()
-        status_placeholder = st.empty()
+    # Queue the transformation so this script thread stays free while the API calls run
+    if uploaded_file is not None and 'process_button' in locals() and (process_button or reroll_button or variants_button):
+        from src.openai_client import get_shared_client
+        from src.jobs import JobQueueFull
+        
+        try:
+            # Reuse the process-wide client for this key so connections stay warm across reruns
+            openai_client = get_shared_client(
+                api_key,
+                cache=get_result_cache(),
+                description_cache=get_description_cache(),
+                near_duplicate_index=get_near_duplicate_index(),
+                rate_limiter=get_rate_limiter()
+            )
+            variants = VARIANT_COUNT if variants_button else 0
+            st.session_state["job_id"] = get_job_queue().submit(
+                run_transformation, openai_client, source, uploaded_file.name, upload_digest,
+                reroll=reroll_button, variants=variants
+            )
+            st.session_state["job_variants"] = variants
+        except JobQueueFull:
+            st.session_state["job_error"] = RuntimeError("DeGhiblify is busy right now. Please try again in a minute.")
+    
+    # Show the error from this session's last failed job, once
+    job_error = st.session_state.pop("job_error", None)
+    if job_error is not None:
+        error_message = handle_api_error(job_error)
+        st.markdown(f'''
+        <div style="background-color: rgba(239, 68, 68, 0.1); border-left: 3px solid #ef4444; padding: 15px; border-radius: 8px; margin-bottom: 20px;">
+            <p style="margin: 0; display: flex; align-items: center; color: #ef4444 !important;">
+                <span style="margin-right: 10px; font-size: 1.2rem;">❌</span>
+                {error_message}
+            </p>
+        </div>
+        ''', unsafe_allow_html=True)
+        
+        if DEBUG_MODE:
+            st.exception(job_error)
+    
+    # Progress and status message shown once each pipeline stage completes
+    stage_progress = {
+        "encoded": (20, "Analyzing Ghibli character..."),
+        "describing": (35, "Describing your character..."),
+        "described": (60, "Generating human interpretation..."),
+        "generated": (85, "Polishing final details..."),
+        "downloaded": (100, "Done!"),
+        "cached": (100, "Found a previous transformation!"),
+    }
+    
+    # Poll the running job without blocking the page; only this fragment reruns until it finishes
+    @st.fragment(run_every=JOB_POLL_SECONDS)
+    def job_status():
+        from src.jobs import DONE, FAILED, QUEUED
         
-        # Initialize progress bar
-        progress_bar = progress_placeholder.progress(0)
+        job_queue = get_job_queue()
+        job = job_queue.get(st.session_state.get("job_id"))
+        if job is None or job.status in (DONE, FAILED):
+            st.session_state.pop("job_id", None)
+            if job is not None and job.status == DONE:
+                save_session_result(job.result)
+            elif job is not None:
+                st.session_state["job_error"] = job.error
+            # The result now lives in the result store's budget; release the queue's copy
+            if job is not None:
+                job_queue.forget(job.id)
+            st.rerun()
         
-        # Define status messages
-        status_messages = {
-            0: "Reading your image...",
-            20: "Analyzing Ghibli character...",
-            40: "Creating detailed description...",
-            60: "Generating human interpretation...",
-            80: "Polishing final details..."
-        }
+        if job.status == QUEUED:
+            ahead = job_queue.position(job.id)
+            percent, message = 0, f"Waiting for a free worker ({ahead} ahead of you, {job.wait_seconds:.0f}s so far)..."
+        elif job.stage is None:
+            percent, message = 5, "Reading your image..."
+        elif job.stage == "variant":
+            done, total = len(job.progress.variants), st.session_state.get("job_variants") or 1
+            percent, message = 60 + 40 * done // total, f"{done} of {total} variations ready..."
+        else:
+            percent, message = stage_progress[job.stage]
+        st.progress(percent)
+        st.markdown(f"<p style='text-align:center; color: #94a3b8 !important;'>{message}</p>", unsafe_allow_html=True)
+        
+        # Show the description live as it streams in, and while the portrait is generated
+        if job.progress.partial_description:
+            st.markdown(
+                f"<div style='background-color: #1e293b; border-radius: 8px; padding: 12px 15px; margin: 10px 0; "
+                f"color: #cbd5e1 !important; font-size: 0.9rem;'>{html.escape(job.progress.partial_description)}</div>",
+                unsafe_allow_html=True
+            )
+        
+        # Fill in variations as each one finishes
+        if st.session_state.get("job_variants") and job.progress.variants:
+            variant_grid(dict(job.progress.variants), st.session_state["job_variants"])
+        
+        # Report queue depth and recent wait times
+        if DEBUG_MODE:
+            stats = job_queue.stats()
+            st.caption(
+                f"Jobs: {stats['queued']} queued, {stats['running']}/{stats['workers']} running, "
+                f"mean wait {stats['mean_wait_seconds']:.1f}s"
+            )
+    
+    if "job_id" in st.session_state:
+        job_status()
+    
+    # Show this session's latest result for the current upload, on every rerun
+    result = get_session_result()
+    if uploaded_file is not None and result is not None and \
+            result["original_digest"] == upload_digest:
+        from PIL import Image
+        
+        result_data = result["result"]
+        result_image = Image.open(BytesIO(result_data))
+        
+        # Display success message
+        st.markdown('''
+        <div style="background-color: rgba(34, 197, 94, 0.1); border-left: 3px solid #22c55e; padding: 15px; border-radius: 8px; margin-bottom: 20px;">
+            <p style="margin: 0; display: flex; align-items: center; color: #22c55e !important;">
+                <span style="margin-right: 10px; font-size: 1.2rem;">✅</span>
+                Transformation complete!
+            </p>
+        </div>
+        ''', unsafe_allow_html=True)
         
-        # Update progress with fewer steps
-        for i in range(0, 101, 5):  # Step by 5 instead of 1
-            progress_bar.progress(i)
+        # Report time to each stage and how much the vision upload was shrunk
+        if DEBUG_MODE:
+            st.caption("Stage timings: " + ", ".join(
+                f"{stage} {elapsed:.1f}s" for stage, elapsed in result["timings"].items()
+            ))
+        payload = result["vision_payload"]
+        if DEBUG_MODE and payload is not None:
+            st.caption(
+                f"Vision payload: {payload['encoded_bytes'] / 1024:.0f} KB {payload['mime_type']} "
+                f"({payload['bytes_saved'] / 1024:.0f} KB saved), ~{payload['tokens']} tokens "
+                f"({payload['tokens_saved']} saved)"
+            )
+        
+        # Outline the subject region sent to the vision model
+        if DEBUG_MODE and payload is not None and payload.get("crop_box") is not None:
+            with st.expander("🔍 Vision crop"):
+                st.image(get_crop_overlay(result["original"], result["original_digest"], payload["crop_box"]),
+                         use_column_width=True)
+        
+        # Display the result
+        image_card(result_data, caption="AI-Generated Human Version", type="after", image=result_image)
+        
+        # Add comparison feature
+        with st.expander("📊 View Before/After Comparison"):
+            cols = st.columns(2)
+            with cols[0]:
+                st.markdown("<h4 style='text-align: center; color: #3b82f6;'>Original</h4>", unsafe_allow_html=True)
+                st.image(get_thumbnail(result["original"], digest=result["original_digest"]), use_column_width=True)
+            with cols[1]:
+                st.markdown("<h4 style='text-align: center; color: #8b5cf6;'>Transformed</h4>", unsafe_allow_html=True)
+                st.image(get_thumbnail(result_data, result_image), use_column_width=True)
+        
+        # Container for download button
+        download_container = st.container()
+        with download_container:
+            st.markdown('''
+            <div style="background-color: #1e293b; border-radius: 12px; padding: 20px; box-shadow: 0 5px 15px rgba(0,0,0,0.2); text-align: center; margin-top: 10px;" class="glow-box">
+                <p style="margin-top: 0; margin-bottom: 15px; font-weight: 500; color: #e2e8f0 !important;">Download your transformed image:</p>
+            </div>
+            ''', unsafe_allow_html=True)
             
-            # Update status message based on progress thresholds
-            for threshold, message in status_messages.items():
-                if i >= threshold and i < threshold + 20:
-                    status_placeholder.markdown(f"<p style='text-align:center; color: #94a3b8 !important;'>{message}</p>", unsafe_allow_html=True)
-                    break
+            # The original is the generated file itself; other formats are encoded once and cached
+            from src.encoding import LOSSY_FORMATS, ImageEncoder, available_formats
+            # Only formats this Pillow build can write, so AVIF is not offered and then served as WebP
+            formats = available_formats()
+            format_cols = st.columns(2)
+            with format_cols[0]:
+                output_format = st.selectbox(
+                    "Format",
+                    formats,
+                    index=formats.index(ImageEncoder.resolve_format(OUTPUT_FORMAT)),
+                    format_func=OUTPUT_FORMAT_LABELS.get,
+                    key="output_format"
+                )
+            with format_cols[1]:
+                output_quality = st.slider(
+                    "Quality", 40, 100, OUTPUT_QUALITY,
+                    key="output_quality",
+                    disabled=output_format not in LOSSY_FORMATS
+                )
             
-            # Sleep less for better responsiveness
-            time.sleep(0.1)
-        
-        # Clear status for results
-        status_placeholder.empty()
+            # Every variation is encoded concurrently; the first one is the result itself
+            variants = result.get("variants") or []
+            encoded = get_image_encoder().encode_many(variants or [result_data], output_format, output_quality)
+            download = encoded[0]
+            base_name = os.path.splitext(generate_output_filename(result["original_name"]))[0]
+            
+            st.download_button(
+                label=f"📥 Download Image ({len(download.data) / 1024:.0f} KB)",
+                data=download.data,
+                file_name=base_name + download.extension,
+                mime=download.mime_type,
+                key="download_btn"
+            )
         
-        with st.spinner("Finalizing your transformation..."):
-            try:
-                # Save uploaded file to a temp file
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-                temp_file.write(uploaded_file.getvalue())
-                temp_file.close()
-                
-                # Initialize the OpenAI client
-                openai_client = OpenAIClient(api_key=api_key)
-                
-                # Transform the image
-                result_url = openai_client.deghiblify_image(image_path=temp_file.name)
-                
-                # Download the result
-                result_image = ImageProcessor.download_image_from_url(result_url)
-                
-                # Display success message
-                st.markdown('''
-                <div style="background-color: rgba(34, 197, 94, 0.1); border-left: 3px solid #22c55e; padding: 15px; border-radius: 8px; margin-bottom: 20px;">
-                    <p style="margin: 0; display: flex; align-items: center; color: #22c55e !important;">
-                        <span style="margin-right: 10px; font-size: 1.2rem;">✅</span>
-                        Transformation complete!
-                    </p>
-                </div>
-                ''', unsafe_allow_html=True)
-                
-                # Display the result
-                image_card(result_image, caption="AI-Generated Human Version", type="after")
-                
-                # Add comparison feature
-                with st.expander("📊 View Before/After Comparison"):
-                    cols = st.columns(2)
-                    with cols[0]:
-                        st.markdown("<h4 style='text-align: center; color: #3b82f6;'>Original</h4>", unsafe_allow_html=True)
-                        st.image(image, use_column_width=True)
-                    with cols[1]:
-                        st.markdown("<h4 style='text-align: center; color: #8b5cf6;'>Transformed</h4>", unsafe_allow_html=True)
-                        st.image(result_image, use_column_width=True)
-                
-                # Prepare download
-                result_bytes = BytesIO()
-                result_image.save(result_bytes, format='PNG')
-                download_filename = generate_output_filename(uploaded_file.name)
-                
-                # Container for download button
-                download_container = st.container()
-                with download_container:
-                    st.markdown('''
-                    <div style="background-color: #1e293b; border-radius: 12px; padding: 20px; box-shadow: 0 5px 15px rgba(0,0,0,0.2); text-align: center; margin-top: 10px;" class="glow-box">
-                        <p style="margin-top: 0; margin-bottom: 15px; font-weight: 500; color: #e2e8f0 !important;">Download your transformed image:</p>
-                    </div>
-                    ''', unsafe_allow_html=True)
-                    
-                    st.download_button(
-                        label="📥 Download Image",
-                        data=result_bytes.getvalue(),
-                        file_name=download_filename,
-                        mime="image/png",
-                        key="download_btn"
-                    )
-                
-                # Clean up temp file
-                os.unlink(temp_file.name)
-                
-            except Exception as e:
-                error_message = handle_api_error(e)
-                st.markdown(f'''
-                <div style="background-color: rgba(239, 68, 68, 0.1); border-left: 3px solid #ef4444; padding: 15px; border-radius: 8px; margin-bottom: 20px;">
-                    <p style="margin: 0; display: flex; align-items: center; color: #ef4444 !important;">
-                        <span style="margin-right: 10px; font-size: 1.2rem;">❌</span>
-                        {error_message}
-                    </p>
-                </div>
-                ''', unsafe_allow_html=True)
-                
-                if DEBUG_MODE:
-                    st.exception(e)
+        # All variations from a fan-out, each downloadable in the chosen format
+        if len(variants) > 1:
+            with st.expander(f"🎨 All {len(variants)} Variations", expanded=True):
+                variant_grid(dict(enumerate(variants)), len(variants))
+                cols = st.columns(len(variants))
+                for index, variant in enumerate(encoded):
+                    with cols[index]:
+                        st.download_button(
+                            label=f"📥 #{index + 1}",
+                            data=variant.data,
+                            file_name=f"{base_name}_{index + 1}{variant.extension}",
+                            mime=variant.mime_type,
+                            key=f"download_variant_{index}"
+                        )
 
 # Footer - dark mode
 st.markdown('''
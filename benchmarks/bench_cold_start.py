@@ -0,0 +1,90 @@
+"""
+Cold-start benchmark of the Streamlit app, run headless with streamlit.testing's AppTest.
+
+Each sample starts a fresh Python process and reports:
+    first run  time of the first script run, including the app's own imports (first paint)
+    rerun      time of a second run in the same process, as a returning interaction sees it
+    imports    modules the first run imported, and whether openai / PIL / NumPy were among them
+    markdown   bytes of markdown/HTML the first run sent to the browser
+
+Compare against an earlier version of app.py with --rev, e.g.:
+    python benchmarks/bench_cold_start.py --samples 5
+    python benchmarks/bench_cold_start.py --samples 5 --rev HEAD~1
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh process: streamlit.testing is imported first so its own cost is excluded
+SAMPLE_SCRIPT = r"""
+import sys, time, json
+from streamlit.testing.v1 import AppTest
+
+before = set(sys.modules)
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+started = time.perf_counter()
+app.run()
+first_run = time.perf_counter() - started
+imported = set(sys.modules) - before
+
+if app.exception:
+    sys.exit("app raised on its first run: " + "; ".join(element.value for element in app.exception))
+
+started = time.perf_counter()
+app.run()
+rerun = time.perf_counter() - started
+
+print(json.dumps({
+    "first_run": first_run,
+    "rerun": rerun,
+    "modules": len(imported),
+    "heavy": sorted(name for name in ("openai", "PIL", "numpy", "requests", "httpx") if name in imported),
+    "markdown_bytes": sum(len(element.value) for element in app.markdown),
+}))
+"""
+
+
+def sample(app_path):
+    """Run the app once in a new process and return its measurements; exits if the app fails."""
+    process = subprocess.run([sys.executable, "-c", SAMPLE_SCRIPT, app_path], cwd=ROOT, capture_output=True, text=True)
+    if process.returncode != 0:
+        sys.exit(process.stderr.strip() or f"benchmark process exited with {process.returncode}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=5, help="Fresh processes to measure")
+    parser.add_argument("--rev", help="Measure app.py as of this git revision instead of the working tree")
+    args = parser.parse_args()
+
+    app_path = os.path.join(ROOT, "app.py")
+    if args.rev:
+        source = subprocess.run(["git", "show", f"{args.rev}:app.py"], cwd=ROOT, capture_output=True, check=True).stdout
+        # Kept next to app.py so its relative imports resolve the same way
+        with tempfile.NamedTemporaryFile(dir=ROOT, prefix=".bench_app_", suffix=".py", delete=False) as f:
+            f.write(source)
+        app_path = f.name
+
+    try:
+        samples = [sample(app_path) for _ in range(args.samples)]
+    finally:
+        if args.rev:
+            os.remove(app_path)
+
+    print(f"app.py at {args.rev or 'working tree'}, {args.samples} fresh processes (median):")
+    print(f"  first run:  {statistics.median(s['first_run'] for s in samples) * 1000:.0f} ms")
+    print(f"  rerun:      {statistics.median(s['rerun'] for s in samples) * 1000:.0f} ms")
+    print(f"  imports:    {statistics.median(s['modules'] for s in samples):.0f} modules "
+          f"(heavy: {', '.join(samples[0]['heavy']) or 'none'})")
+    print(f"  markdown:   {samples[0]['markdown_bytes'] / 1024:.1f} KB sent on first run")
+
+
+if __name__ == "__main__":
+    main()
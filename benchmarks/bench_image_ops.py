@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of ImageProcessor's per-image operations against their batch counterparts
+(resize_images, normalize_images, perceptual_hashes, images_to_base64), on generated images.
+
+Usage:
+    python benchmarks/bench_image_ops.py --images 256 --side 1024 --workers 8
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.image_processor import ImageProcessor
+
+
+def make_images(count, side, seed=0):
+    """Smooth gradients with noise, so encoders see something closer to a photo than pure noise."""
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 255, side, dtype=np.float32)
+    base = np.stack([ramp[None, :].repeat(side, 0), ramp[:, None].repeat(side, 1), np.full((side, side), 128.0)], axis=2)
+    return [
+        Image.fromarray(np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8), "RGB")
+        for _ in range(count)
+    ]
+
+
+def normalize_one(image, size):
+    """Per-image equivalent of normalize_images without mean/std: one array per image."""
+    return np.asarray(ImageProcessor.resize_image(image.convert("RGB"), size), dtype=np.float32) / 255.0
+
+
+def run(name, func, count):
+    """Time func() and print images per second."""
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"  {name:<10} {elapsed * 1000:8.0f} ms  {count / elapsed:8.1f} images/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=256)
+    parser.add_argument("--side", type=int, default=1024, help="Side of the generated images")
+    parser.add_argument("--size", type=int, default=512, help="Side of the resized / normalized output")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Batch workers")
+    parser.add_argument("--format", default="JPEG")
+    parser.add_argument("--quality", type=int, default=85)
+    args = parser.parse_args()
+
+    images = make_images(args.images, args.side)
+    size = (args.size, args.size)
+    save_options = {"quality": args.quality} if args.format == "JPEG" else {}
+    # Start the codec pool's processes outside the timed runs
+    list(ImageProcessor.encode_images(images[:args.workers], format=args.format, workers=args.workers, **save_options))
+
+    cases = [
+        ("resize",
+         lambda: [ImageProcessor.resize_image(image, size) for image in images],
+         lambda: list(ImageProcessor.resize_images(images, size, workers=args.workers))),
+        ("normalize",
+         lambda: [normalize_one(image, size) for image in images],
+         lambda: list(ImageProcessor.normalize_images(images, size))),
+        ("hash",
+         lambda: [ImageProcessor.perceptual_hash(image) for image in images],
+         lambda: list(ImageProcessor.perceptual_hashes(images, workers=args.workers))),
+        ("base64",
+         lambda: [ImageProcessor.image_to_base64(image, format=args.format, **save_options) for image in images],
+         lambda: list(ImageProcessor.images_to_base64(images, format=args.format, workers=args.workers, **save_options))),
+    ]
+
+    print(f"{args.images} images of {args.side}x{args.side}, {args.workers} workers\n")
+    for name, per_image, batched in cases:
+        print(f"{name}:")
+        single = run("per-image", per_image, args.images)
+        batch = run("batched", batched, args.images)
+        print(f"  speedup    {single / batch:8.2f}x")
+
+    # Both paths must agree
+    assert list(ImageProcessor.perceptual_hashes(images[:8])) == [ImageProcessor.perceptual_hash(image) for image in images[:8]]
+
+
+if __name__ == "__main__":
+    main()
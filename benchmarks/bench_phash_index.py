@@ -0,0 +1,69 @@
+"""
+Benchmark near-duplicate lookups in PerceptualHashIndex against a linear scan.
+
+Usage:
+    python benchmarks/bench_phash_index.py --entries 200000 --queries 2000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.phash_index import PerceptualHashIndex, hamming_distance
+
+
+def perturb(hash_value, bits, rng):
+    """Flip a number of random bits in a 64-bit hash."""
+    for position in rng.sample(range(64), bits):
+        hash_value ^= 1 << position
+    return hash_value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--max-distance", type=int, default=4)
+    parser.add_argument("--linear-queries", type=int, default=50, help="Queries to time with a linear scan")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    hashes = [rng.getrandbits(64) for _ in range(args.entries)]
+
+    index = PerceptualHashIndex(max_distance=args.max_distance)
+    start = time.perf_counter()
+    for i, hash_value in enumerate(hashes):
+        index.add(hash_value, i)
+    build_time = time.perf_counter() - start
+
+    queries = [
+        (i, perturb(hashes[i], rng.randint(0, args.max_distance), rng))
+        for i in rng.sample(range(args.entries), args.queries)
+    ]
+
+    hits = 0
+    start = time.perf_counter()
+    for expected, query in queries:
+        match = index.lookup(query)
+        if match is not None and match[0] == expected:
+            hits += 1
+    index_time = time.perf_counter() - start
+
+    linear_queries = queries[:args.linear_queries]
+    start = time.perf_counter()
+    for _, query in linear_queries:
+        min(hashes, key=lambda candidate: hamming_distance(query, candidate))
+    linear_time = time.perf_counter() - start
+
+    print(f"entries:            {args.entries}")
+    print(f"build:              {build_time:.2f}s")
+    print(f"index lookup:       {index_time / len(queries) * 1e6:.1f} us/query ({hits}/{len(queries)} exact matches found)")
+    print(f"linear scan lookup: {linear_time / len(linear_queries) * 1e6:.1f} us/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+End-to-end benchmark of OpenAIClient.deghiblify_image and ImageProcessor.download_image_from_url
+against the local mock OpenAI API (see mock_openai.py), so no real API calls are made.
+
+Latencies default to a tenth of typical GPT-4o / DALL·E 3 timings to keep runs short; pass
+--chat-latency / --image-latency to change them.
+
+Usage:
+    python benchmarks/bench_pipeline.py --requests 50 --concurrency 8 --response-format url
+    python benchmarks/bench_pipeline.py --throttle-rate 0.1 --rate-limiter
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.mock_openai import add_mock_arguments, create_mock_server, make_png
+from src.openai_client import OpenAIClient, create_http_client
+from src.image_processor import ImageProcessor
+from src.rate_limiter import create_rate_limiter
+from src.batch import percentile
+
+
+def measure(func, requests, concurrency):
+    """Call func requests times from concurrency threads, returning (sorted latencies, errors, elapsed)."""
+    def timed(_):
+        started = time.perf_counter()
+        try:
+            func()
+            return time.perf_counter() - started, None
+        except Exception as e:
+            return time.perf_counter() - started, e
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, error in outcomes if error is None)
+    errors = [error for _, error in outcomes if error is not None]
+    return latencies, errors, elapsed
+
+
+def report(name, latencies, errors, elapsed, stats_before, stats_after):
+    """Print latency percentiles, throughput and bytes moved for one benchmark."""
+    received = stats_after["bytes_received"] - stats_before["bytes_received"]
+    sent = stats_after["bytes_sent"] - stats_before["bytes_sent"]
+    print(f"{name}:")
+    print(f"  requests:   {len(latencies)} ok, {len(errors)} failed"
+          + (f" (first error: {errors[0]!r})" if errors else ""))
+    if latencies:
+        print(f"  latency:    p50 {percentile(latencies, 0.5) * 1000:.0f} ms, "
+              f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms, p99 {percentile(latencies, 0.99) * 1000:.0f} ms")
+    print(f"  throughput: {len(latencies) / elapsed:.2f} req/s")
+    print(f"  bytes:      {received / 1024 / 1024:.1f} MB uploaded, {sent / 1024 / 1024:.1f} MB downloaded, "
+          f"{stats_after['throttled'] - stats_before['throttled']} 429s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--response-format", choices=["b64_json", "url"], default="b64_json")
+    parser.add_argument("--input", help="Input image (default: generated noise PNG)")
+    parser.add_argument("--input-side", type=int, default=1024, help="Side of the generated input image")
+    parser.add_argument("--rate-limiter", action="store_true", help="Route calls through the configured RateLimiter")
+    parser.add_argument("--downloads", type=int, default=50, help="download_image_from_url calls (0 to skip)")
+    add_mock_arguments(parser)
+    parser.set_defaults(chat_latency="lognormal:0.2,0.3", image_latency="lognormal:1.2,0.2",
+                        download_latency="fixed:0.005")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, "rb") as f:
+            input_bytes = f.read()
+    else:
+        input_bytes = make_png(args.input_side, args.input_side, seed=1)
+
+    with create_mock_server(args) as server:
+        client = OpenAIClient(
+            api_key="mock",
+            base_url=server.base_url,
+            image_response_format=args.response_format,
+            http_client=create_http_client(),
+            rate_limiter=create_rate_limiter() if args.rate_limiter else None
+        )
+
+        print(f"input: {len(input_bytes) / 1024:.0f} KB, {args.requests} requests at concurrency {args.concurrency}, "
+              f"{args.response_format} responses\n")
+        before = server.stats.snapshot()
+        latencies, errors, elapsed = measure(lambda: client.deghiblify_image(input_bytes), args.requests, args.concurrency)
+        report("deghiblify_image", latencies, errors, elapsed, before, server.stats.snapshot())
+
+        if args.downloads:
+            image_url = f"{server.url}/images/benchmark.png"
+            before = server.stats.snapshot()
+            latencies, errors, elapsed = measure(
+                lambda: ImageProcessor.download_image_from_url(image_url), args.downloads, args.concurrency
+            )
+            report("download_image_from_url", latencies, errors, elapsed, before, server.stats.snapshot())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Local stand-in for the OpenAI endpoints DeGhiblify uses, for benchmarks and offline runs.
+
+Emulates POST /v1/chat/completions (plain or streamed) and POST /v1/images/generations
+(b64_json or url responses, with the images served from GET /images/<id>.png), with configurable latency
+distributions, 429 rate and generated image size. Latency specs are "fixed:SECONDS",
+"uniform:LOW,HIGH" or "lognormal:MEDIAN,SIGMA".
+
+Usage:
+    python benchmarks/mock_openai.py --port 8900 --chat-latency lognormal:2,0.3 --image-latency lognormal:12,0.2
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=mock streamlit run app.py
+"""
+import json
+import math
+import time
+import uuid
+import zlib
+import base64
+import random
+import struct
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def parse_latency(spec: str):
+    """Turn a latency spec into a zero-argument function returning seconds."""
+    kind, _, values = spec.partition(":")
+    params = [float(value) for value in values.split(",")] if values else []
+    if kind == "fixed":
+        return lambda: params[0]
+    if kind == "uniform":
+        return lambda: random.uniform(params[0], params[1])
+    if kind == "lognormal":
+        median, sigma = params
+        return lambda: random.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+def make_png(width: int, height: int, seed: int = 0) -> bytes:
+    """Encode an RGB noise image as PNG without Pillow; noise keeps the file close to raw size."""
+    rng = random.Random(seed)
+    row_bytes = width * 3
+    raw = b"".join(b"\x00" + rng.getrandbits(8 * row_bytes).to_bytes(row_bytes, "little") for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b""))
+
+
+class MockStats:
+    """Request and byte counters shared by the handler threads."""
+
+    def __init__(self):
+        self.requests = {}
+        self.throttled = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def record(self, path: str, received: int, sent: int, throttled: bool = False) -> None:
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            self.bytes_received += received
+            self.bytes_sent += sent
+            self.throttled += int(throttled)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "throttled": self.throttled,
+                "bytes_received": self.bytes_received,
+                "bytes_sent": self.bytes_sent,
+            }
+
+
+class MockOpenAIServer:
+    """Threaded HTTP server emulating the chat completions and image generation endpoints."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, chat_latency: str = "fixed:0",
+                 image_latency: str = "fixed:0", download_latency: str = "fixed:0",
+                 throttle_rate: float = 0.0, retry_after: float = 0.1, image_side: int = 1024,
+                 description_words: int = 150):
+        """
+        Initialize the mock server.
+
+        Args:
+            host (str): Interface to bind.
+            port (int): Port to bind; 0 picks a free one.
+            chat_latency (str): Latency spec for chat completions.
+            image_latency (str): Latency spec for image generations.
+            download_latency (str): Latency spec for serving generated image URLs.
+            throttle_rate (float): Fraction of API calls answered with 429.
+            retry_after (float): Seconds advertised in the retry-after header of a 429.
+            image_side (int): Width and height of generated images; noise PNGs are about 3 bytes per pixel.
+            description_words (int): Length of the returned descriptions.
+        """
+        self.chat_latency = parse_latency(chat_latency)
+        self.image_latency = parse_latency(image_latency)
+        self.download_latency = parse_latency(download_latency)
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.image = make_png(image_side, image_side)
+        self.image_b64 = base64.b64encode(self.image).decode("ascii")
+        self.description = " ".join(["realistic"] * description_words)
+        self.stats = MockStats()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        """Base URL to pass as the OpenAI client's base_url."""
+        return self.url + "/v1"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so client connection pooling behaves as it does against the real API
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, content_type="application/json", headers=None, received=0):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+                path = "/images" if self.path.startswith("/images/") else self.path.split("?")[0]
+                server.stats.record(path, received, len(body), throttled=status == 429)
+
+            def _send_json(self, status, payload, **kwargs):
+                self._send(status, json.dumps(payload).encode("utf-8"), **kwargs)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if random.random() < server.throttle_rate:
+                    self._send_json(429, {"error": {
+                        "message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"
+                    }}, headers={"retry-after-ms": str(int(server.retry_after * 1000))}, received=len(body))
+                    return
+
+                request = json.loads(body or b"{}")
+                if self.path == "/v1/chat/completions" and request.get("stream"):
+                    self._stream_chat(request, received=len(body))
+                elif self.path == "/v1/chat/completions":
+                    time.sleep(server.chat_latency())
+                    self._send_json(200, {
+                        "id": f"chatcmpl-{uuid.uuid4().hex}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": request.get("model", "gpt-4o"),
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": server.description},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": {"prompt_tokens": 1000, "completion_tokens": 200, "total_tokens": 1200},
+                    }, received=len(body))
+                elif self.path == "/v1/images/generations":
+                    time.sleep(server.image_latency())
+                    if request.get("response_format") == "b64_json":
+                        entry = {"b64_json": server.image_b64}
+                    else:
+                        entry = {"url": f"{server.url}/images/{uuid.uuid4().hex}.png"}
+                    entry["revised_prompt"] = request.get("prompt", "")
+                    self._send_json(200, {"created": int(time.time()), "data": [entry]}, received=len(body))
+                else:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}}, received=len(body))
+
+            def _stream_chat(self, request, received):
+                """Send the description as server-sent events: the first token after a fifth of the latency, the rest spread evenly."""
+                latency = server.chat_latency()
+                words = server.description.split(" ")
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+                def event(choices, usage=None):
+                    return "data: " + json.dumps({
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": request.get("model", "gpt-4o"),
+                        "choices": choices,
+                        "usage": usage,
+                    }) + "\n\n"
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                sent = 0
+
+                def write(text):
+                    nonlocal sent
+                    data = text.encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                    sent += len(data)
+
+                time.sleep(latency * 0.2)
+                for i, word in enumerate(words):
+                    content = word if i == 0 else " " + word
+                    write(event([{"index": 0, "delta": {"content": content}, "finish_reason": None}]))
+                    time.sleep(latency * 0.8 / len(words))
+                write(event([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+                if (request.get("stream_options") or {}).get("include_usage"):
+                    write(event([], {"prompt_tokens": 1000, "completion_tokens": len(words), "total_tokens": 1000 + len(words)}))
+                write("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                server.stats.record(self.path, received, sent)
+
+            def do_GET(self):
+                if self.path.startswith("/images/"):
+                    time.sleep(server.download_latency())
+                    self._send(200, server.image, content_type="image/png")
+                else:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        return Handler
+
+    def serve_forever(self) -> None:
+        """Serve in the calling thread until stopped."""
+        self._httpd.serve_forever()
+
+    def start(self) -> "MockOpenAIServer":
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the mock server options to a command-line parser."""
+    parser.add_argument("--chat-latency", default="lognormal:2,0.3", help="Latency spec for chat completions")
+    parser.add_argument("--image-latency", default="lognormal:12,0.2", help="Latency spec for image generations")
+    parser.add_argument("--download-latency", default="fixed:0.05", help="Latency spec for image URL downloads")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of API calls answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Seconds advertised on 429 responses")
+    parser.add_argument("--image-side", type=int, default=1024, help="Side of generated images in pixels")
+
+
+def create_mock_server(args, host: str = "127.0.0.1", port: int = 0) -> MockOpenAIServer:
+    """Create a mock server from parsed add_mock_arguments options."""
+    return MockOpenAIServer(
+        host=host,
+        port=port,
+        chat_latency=args.chat_latency,
+        image_latency=args.image_latency,
+        download_latency=args.download_latency,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        image_side=args.image_side
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = create_mock_server(args, host=args.host, port=args.port)
+    print(f"Mock OpenAI API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats.snapshot(), indent=2))
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,104 @@
 # filepath: DeGhiblify/DeGhiblify/config/settings.py
 
+import os
+
 OPENAI_API_KEY = "your_openai_api_key_here"
 IMAGE_OUTPUT_SIZE = (512, 512)  # Desired output size for human-looking images
 DEBUG_MODE = True  # Set to False in production
+
+# Display thumbnails rendered in the app (full resolution is only used for download)
+THUMBNAIL_MAX_SIDE = 768
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_CACHE_ITEMS = 256
+
+# Vision input preprocessing (GPT-4o high detail never uses more than 2048px / 768px short side)
+VISION_MAX_SIDE = 2048
+VISION_SHORT_SIDE = 768
+VISION_JPEG_QUALITY = 85
+# Crop scene-wide uploads to the detected subject (plus margin) before the vision call;
+# the full frame is kept when the subject would cover more than VISION_CROP_MAX_AREA of it
+VISION_CROP_TO_SUBJECT = True
+VISION_CROP_MARGIN = 0.15
+VISION_CROP_MAX_AREA = 0.8
+VISION_STREAM = True  # Stream description tokens so progress shows text before the vision call finishes
+
+# Upload decoding: larger files or images are refused outright (decompression-bomb policy), and
+# accepted ones are decoded at no more than DECODE_MAX_SIDE per side since no later stage needs more
+UPLOAD_MAX_BYTES = 25 * 1024 * 1024
+IMAGE_MAX_PIXELS = 64 * 1000 * 1000
+DECODE_MAX_SIDE = VISION_MAX_SIDE
+
+# Batch image operations (ImageProcessor.*_images): codec work runs in a process pool of
+# BATCH_CODEC_WORKERS, resampling in threads; BATCH_SIZE images are stacked per NumPy array
+BATCH_CODEC_WORKERS = os.cpu_count() or 1
+BATCH_SIZE = 64
+
+# Download encoding (src/encoding.py): "ORIGINAL" serves the generated bytes untouched; "WEBP",
+# "AVIF" (WebP where Pillow cannot write AVIF), progressive "JPEG" and "PNG" are encoded on demand
+OUTPUT_FORMAT = "ORIGINAL"
+OUTPUT_QUALITY = 85
+OUTPUT_ENCODE_WORKERS = 2
+OUTPUT_CACHE_ITEMS = 64
+
+# Generated image retrieval: "b64_json" returns the image inline, "url" needs a separate download
+IMAGE_RESPONSE_FORMAT = "b64_json"
+DOWNLOAD_TIMEOUT = (5, 30)  # Connect and read timeouts in seconds
+DOWNLOAD_MAX_BYTES = 20 * 1024 * 1024
+DOWNLOAD_POOL_SIZE = 16  # Keep-alive connections kept per host
+
+# Shared OpenAI clients (one per API key) and their connection pools
+SHARED_CLIENT_POOL_SIZE = 32
+OPENAI_MAX_CONNECTIONS = 20
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 10
+
+# Result cache settings
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "results")
+CACHE_MEMORY_ITEMS = 64  # Number of generated images kept in memory
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # Maximum size of the on-disk cache
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60  # Drop cached results not used for a week
+
+# Description cache settings
+DESCRIPTION_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "descriptions")
+DESCRIPTION_CACHE_MEMORY_ITEMS = 1024  # Descriptions are small, so keep many in memory
+DESCRIPTION_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Near-duplicate matching of uploads (perceptual hash hamming distance, out of 64 bits); the
+# index is kept next to the result cache so it survives restarts, and entries whose result has
+# left the cache are dropped when a lookup finds them
+NEAR_DUPLICATE_MAX_DISTANCE = 4
+NEAR_DUPLICATE_MAX_ENTRIES = 20000
+NEAR_DUPLICATE_INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "near_duplicates.log")
+
+# Client-side rate limits per model; set these to your OpenAI account's tier
+RATE_LIMITS = {
+    "gpt-4o": {"requests_per_minute": 500, "tokens_per_minute": 30000},
+    "dall-e-3": {"requests_per_minute": 7, "images_per_minute": 7},
+}
+RATE_LIMIT_MAX_RETRIES = 5
+
+# Per-session result store: shared memory budget with least recently used results spilled to disk
+RESULT_STORE_MEMORY_BYTES = 256 * 1024 * 1024
+RESULT_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "sessions")
+RESULT_STORE_DISK_BYTES = 2 * 1024 * 1024 * 1024
+RESULT_STORE_TTL_SECONDS = 24 * 60 * 60
+RESULT_STORE_ENTRIES_PER_SESSION = 5
+
+# Background jobs: workers cap concurrent transformations across all sessions
+JOB_WORKERS = 4
+JOB_MAX_PENDING = 32
+JOB_RETENTION_SECONDS = 60 * 60
+JOB_POLL_SECONDS = 0.5
+
+# HTTP API service (src/api_server.py)
+API_MAX_BODY_BYTES = 10 * 1024 * 1024
+API_MAX_CONCURRENCY = 8
+API_MAX_PENDING = 64
+API_RESULT_TTL_SECONDS = 60 * 60
+
+# Per-stage timing and usage metrics; exported as Prometheus text on METRICS_PORT when enabled
+METRICS_ENABLED = os.getenv("DEGHIBLIFY_METRICS", "").lower() in ("1", "true", "yes")
+METRICS_PORT = int(os.getenv("DEGHIBLIFY_METRICS_PORT", "9464"))
+
+# Portraits generated concurrently from one description by "Generate Variations"
+VARIANT_COUNT = 4
@@ -0,0 +1,290 @@
+"""
+HTTP API for DeGhiblify transformations, for programmatic clients.
+
+Usage:
+    python -m src.api_server --port 8080 --max-concurrency 8
+
+Endpoints:
+    POST /v1/transformations             Submit an image (raw body or multipart field "image").
+                                         Returns 202 with the job ID, or the generated image
+                                         directly with ?wait=SECONDS if it finishes in time.
+    GET  /v1/transformations/{id}        Job status; ?wait=SECONDS holds the request until it finishes.
+    GET  /v1/transformations/{id}/image  Generated image bytes, streamed.
+    GET  /healthz                        Queue depth and concurrency.
+    GET  /metrics                        Per-stage timings and usage in Prometheus text format
+                                         (collected when DEGHIBLIFY_METRICS=1).
+
+Set OPENAI_BASE_URL (or --base-url) to point the service at a local mock of the OpenAI API.
+"""
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+from io import BytesIO
+from collections import OrderedDict
+from typing import Optional
+
+from aiohttp import web
+from PIL import Image
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.async_openai_client import AsyncOpenAIClient
+from src.image_processor import MIME_TYPES, ImageTooLarge, SourceImage
+from src.jobs import Job, QUEUED, RUNNING, DONE, FAILED
+from src.metrics import metrics, PROMETHEUS_CONTENT_TYPE
+from src.cache import create_result_cache, create_description_cache
+from src.utils import handle_api_error
+from config.settings import (
+    API_MAX_BODY_BYTES, API_MAX_CONCURRENCY, API_MAX_PENDING, API_RESULT_TTL_SECONDS, IMAGE_MAX_PIXELS,
+)
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def _wait_seconds(request: web.Request) -> float:
+    """Read the optional ?wait=SECONDS query parameter."""
+    try:
+        return max(0.0, float(request.query.get("wait", 0)))
+    except ValueError:
+        raise web.HTTPBadRequest(text="wait must be a number of seconds")
+
+
+class TransformationService:
+    """
+    Runs transformations on an AsyncOpenAIClient with bounded concurrency.
+
+    At most max_concurrency transformations call the API at once; the rest wait their
+    turn, and submissions beyond max_pending are refused with 503 so a burst cannot
+    queue unbounded work. Finished jobs are kept for result_ttl_seconds.
+    """
+
+    def __init__(self, client: AsyncOpenAIClient, max_concurrency: int = 8, max_pending: int = 64,
+                 max_body_bytes: int = 10 * 1024 * 1024, result_ttl_seconds: float = 3600):
+        """
+        Initialize the service.
+
+        Args:
+            client (AsyncOpenAIClient): Client used for every transformation; its caches are honoured.
+            max_concurrency (int): Transformations calling the API at once.
+            max_pending (int): Queued and running jobs accepted before new submissions get 503.
+            max_body_bytes (int): Largest upload accepted.
+            result_ttl_seconds (float): Finished jobs are forgotten this long after they complete.
+        """
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.max_body_bytes = max_body_bytes
+        self.result_ttl_seconds = result_ttl_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._jobs = OrderedDict()
+        self._tasks = {}
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - self.result_ttl_seconds
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _pending(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.finished)
+
+    async def _run(self, job: Job, source: SourceImage) -> None:
+        async with self._semaphore:
+            job.started_at = time.monotonic()
+            job.status = RUNNING
+            # Stage times count from here, not from submit, so they leave out the wait for a slot
+            job.progress.started = time.perf_counter()
+            try:
+                job.result = await self.client.deghiblify_image(source, progress=job.progress)
+                status = DONE
+            except Exception as e:
+                job.error = e
+                status = FAILED
+            job.finished_at = time.monotonic()
+            job.status = status
+            self._tasks.pop(job.id, None)
+
+    def _get_job(self, request: web.Request) -> Job:
+        job = self._jobs.get(request.match_info["job_id"])
+        if job is None:
+            raise web.HTTPNotFound(text="Unknown or expired job")
+        return job
+
+    async def _wait(self, job: Job, timeout: float) -> None:
+        """Wait up to timeout seconds for a job; the job keeps running if the client disconnects."""
+        task = self._tasks.get(job.id)
+        if task is None or timeout <= 0:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _status(self, request: web.Request, job: Job) -> dict:
+        status = {
+            "id": job.id,
+            "status": job.status,
+            "stage": job.stage,
+            "wait_seconds": round(job.wait_seconds, 3),
+            "run_seconds": round(job.run_seconds, 3),
+        }
+        if job.status == DONE:
+            status["image_url"] = str(request.app.router["image"].url_for(job_id=job.id))
+        elif job.status == FAILED:
+            status["error"] = handle_api_error(job.error)
+        return status
+
+    async def _read_upload(self, request: web.Request) -> bytes:
+        if request.content_length is not None and request.content_length > self.max_body_bytes:
+            raise web.HTTPRequestEntityTooLarge(max_size=self.max_body_bytes, actual_size=request.content_length)
+        if request.content_type.startswith("multipart/"):
+            form = await request.post()
+            field = form.get("image")
+            if not isinstance(field, web.FileField):
+                raise web.HTTPBadRequest(text='Multipart uploads need an "image" file field')
+            return field.file.read()
+        return await request.read()
+
+    async def submit(self, request: web.Request) -> web.StreamResponse:
+        wait = _wait_seconds(request)
+        data = await self._read_upload(request)
+        if not data:
+            raise web.HTTPBadRequest(text="Empty upload")
+        source = SourceImage.from_any(data)
+        try:
+            # Parses the header only; pixels are decoded later on a worker thread
+            source.check_limits(max_bytes=self.max_body_bytes)
+        except ImageTooLarge as e:
+            raise web.HTTPRequestEntityTooLarge(max_size=IMAGE_MAX_PIXELS, actual_size=len(data), text=str(e))
+        except Exception:
+            raise web.HTTPUnsupportedMediaType(text="Upload is not a supported image")
+
+        self._prune()
+        if self._pending() >= self.max_pending:
+            raise web.HTTPServiceUnavailable(text="Too many pending transformations", headers={"Retry-After": "5"})
+
+        job = Job(uuid.uuid4().hex)
+        self._jobs[job.id] = job
+        self._tasks[job.id] = asyncio.ensure_future(self._run(job, source))
+
+        await self._wait(job, wait)
+        if job.status == DONE:
+            return await self._stream_image(request, job)
+        return web.json_response(self._status(request, job), status=202,
+                                 headers={"Location": str(request.app.router["status"].url_for(job_id=job.id))})
+
+    async def status(self, request: web.Request) -> web.Response:
+        job = self._get_job(request)
+        await self._wait(job, _wait_seconds(request))
+        return web.json_response(self._status(request, job))
+
+    async def image(self, request: web.Request) -> web.StreamResponse:
+        job = self._get_job(request)
+        if job.status == FAILED:
+            raise web.HTTPUnprocessableEntity(text=handle_api_error(job.error))
+        if job.status != DONE:
+            raise web.HTTPConflict(text="Transformation has not finished yet")
+        return await self._stream_image(request, job)
+
+    async def _stream_image(self, request: web.Request, job: Job) -> web.StreamResponse:
+        """Write the result in chunks so large images are not copied into one response buffer."""
+        data = memoryview(job.result)
+        image_format = Image.open(BytesIO(job.result)).format
+        response = web.StreamResponse(headers={"Cache-Control": "private, max-age=3600"})
+        response.content_type = MIME_TYPES.get(image_format, "application/octet-stream")
+        response.content_length = len(data)
+        await response.prepare(request)
+        for offset in range(0, len(data), STREAM_CHUNK_BYTES):
+            await response.write(data[offset:offset + STREAM_CHUNK_BYTES])
+        await response.write_eof()
+        return response
+
+    async def health(self, request: web.Request) -> web.Response:
+        queued = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+        running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+        return web.json_response({
+            "status": "ok",
+            "queued": queued,
+            "running": running,
+            "max_concurrency": self.max_concurrency,
+            "max_pending": self.max_pending,
+        })
+
+    async def export_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=metrics.render_prometheus().encode("utf-8"),
+                            headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
+
+    async def close(self) -> None:
+        """Cancel unfinished jobs and close the client's connections."""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        await self.client.close()
+
+
+def create_app(client: Optional[AsyncOpenAIClient] = None, max_concurrency: int = API_MAX_CONCURRENCY,
+               max_pending: int = API_MAX_PENDING, max_body_bytes: int = API_MAX_BODY_BYTES,
+               result_ttl_seconds: float = API_RESULT_TTL_SECONDS) -> web.Application:
+    """
+    Create the aiohttp application.
+
+    Args:
+        client (Optional[AsyncOpenAIClient]): Client to use; by default one is created with the
+            result and description caches, reading OPENAI_API_KEY and OPENAI_BASE_URL.
+        max_concurrency (int): Transformations calling the API at once.
+        max_pending (int): Queued and running jobs accepted before new submissions get 503.
+        max_body_bytes (int): Largest upload accepted.
+        result_ttl_seconds (float): Finished jobs are forgotten this long after they complete.
+
+    Returns:
+        web.Application: Application ready for web.run_app or an aiohttp test client.
+    """
+    service = TransformationService(
+        client or AsyncOpenAIClient(cache=create_result_cache(), description_cache=create_description_cache()),
+        max_concurrency=max_concurrency,
+        max_pending=max_pending,
+        max_body_bytes=max_body_bytes,
+        result_ttl_seconds=result_ttl_seconds
+    )
+    # Leave headroom for multipart framing around the image itself
+    app = web.Application(client_max_size=max_body_bytes + 64 * 1024)
+    app.router.add_post("/v1/transformations", service.submit)
+    app.router.add_get("/v1/transformations/{job_id}", service.status, name="status")
+    app.router.add_get("/v1/transformations/{job_id}/image", service.image, name="image")
+    app.router.add_get("/healthz", service.health)
+    app.router.add_get("/metrics", service.export_metrics)
+
+    async def close_service(app):
+        await service.close()
+
+    app.on_cleanup.append(close_service)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--max-concurrency", type=int, default=API_MAX_CONCURRENCY, help="Transformations in flight at once")
+    parser.add_argument("--max-pending", type=int, default=API_MAX_PENDING, help="Jobs accepted before returning 503")
+    parser.add_argument("--max-body-mb", type=float, default=API_MAX_BODY_BYTES / (1024 * 1024), help="Largest upload accepted")
+    parser.add_argument("--base-url", help="OpenAI API base URL, e.g. a local mock server")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the result and description caches")
+    args = parser.parse_args(argv)
+
+    caches = {} if args.no_cache else {"cache": create_result_cache(), "description_cache": create_description_cache()}
+    client = AsyncOpenAIClient(base_url=args.base_url, **caches)
+
+    web.run_app(create_app(
+        client,
+        max_concurrency=args.max_concurrency,
+        max_pending=args.max_pending,
+        max_body_bytes=int(args.max_body_mb * 1024 * 1024)
+    ), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
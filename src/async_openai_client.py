@@ -0,0 +1,371 @@
+import os
+import sys
+import base64
+import asyncio
+import functools
+from typing import AsyncIterator, Callable, List, Optional, Tuple, Union
+
+import httpx
+from openai import AsyncOpenAI
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.image_processor import ImageInput, SourceImage
+from src.metrics import metrics
+from src.openai_client import (
+    BaseOpenAIClient, ProgressReporter, build_vision_messages, build_portrait_prompt, record_usage, default_variants,
+    VISION_MODEL, VISION_MAX_TOKENS, IMAGE_MODEL, IMAGE_SIZE, IMAGE_QUALITY,
+)
+from config.settings import IMAGE_RESPONSE_FORMAT, DOWNLOAD_TIMEOUT, DOWNLOAD_MAX_BYTES, DOWNLOAD_POOL_SIZE
+
+
+class AsyncOpenAIClient(BaseOpenAIClient):
+    """Asyncio client for interacting with OpenAI APIs, sharing prompts and caches with OpenAIClient."""
+
+    def __init__(self, api_key: Optional[str] = None, cache=None, description_cache=None,
+                 near_duplicate_index=None, image_response_format: str = IMAGE_RESPONSE_FORMAT,
+                 base_url: Optional[str] = None):
+        """
+        Initialize the async OpenAI client with provided API key or from environment.
+
+        Args:
+            api_key (Optional[str]): OpenAI API key. If not provided, it is read from the environment variable 'OPENAI_API_KEY'.
+            cache: Optional result cache (see src.cache) mapping input digests to generated image bytes.
+            description_cache: Optional cache mapping input digests to GPT-4o descriptions.
+            near_duplicate_index: Optional PerceptualHashIndex used to serve re-saved or resized
+                uploads from the result cache.
+            image_response_format (str): "b64_json" to receive generated images inline, or "url"
+                to download them in a separate request.
+            base_url (Optional[str]): OpenAI API base URL, e.g. a local mock server. Defaults to
+                the OPENAI_BASE_URL environment variable or the public API.
+        """
+        super().__init__(api_key, cache, description_cache, near_duplicate_index, image_response_format)
+        self.client = AsyncOpenAI(api_key=self.api_key, base_url=base_url)
+        connect_timeout, read_timeout = DOWNLOAD_TIMEOUT
+        self.http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=DOWNLOAD_POOL_SIZE, max_keepalive_connections=DOWNLOAD_POOL_SIZE)
+        )
+
+    async def _run_blocking(self, func, *args):
+        """Run file, cache and image work in the default executor so the event loop stays free."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args))
+
+    async def _get_realistic_description_from_gpt4o(self, image_data_url: str) -> str:
+        """
+        Use GPT-4o to generate a realistic description of the anime character.
+
+        Args:
+            image_data_url (str): Image as a base64 data URL.
+
+        Returns:
+            str: Realistic character description.
+        """
+        with metrics.span("vision"):
+            response = await self.client.chat.completions.create(
+                model=VISION_MODEL,
+                messages=build_vision_messages(image_data_url),
+                max_tokens=VISION_MAX_TOKENS
+            )
+        record_usage(VISION_MODEL, response.usage)
+        return response.choices[0].message.content.strip()
+
+    async def _stream_realistic_description(self, image_data_url: str) -> AsyncIterator[str]:
+        """
+        Stream GPT-4o's realistic description of the anime character as it is generated.
+
+        Args:
+            image_data_url (str): Image as a base64 data URL.
+
+        Yields:
+            str: Description text fragments, in order.
+        """
+        with metrics.span("vision"):
+            stream = await self.client.chat.completions.create(
+                model=VISION_MODEL,
+                messages=build_vision_messages(image_data_url),
+                max_tokens=VISION_MAX_TOKENS,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            async with stream:
+                async for chunk in stream:
+                    # The final chunk carries usage and no choices
+                    if chunk.usage is not None:
+                        record_usage(VISION_MODEL, chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+
+    async def _generate_dalle_image(self, description: str, style: Optional[str] = None, size: str = IMAGE_SIZE,
+                                    hint: Optional[str] = None):
+        """
+        Use DALL·E 3 to generate a photorealistic image based on description.
+
+        Args:
+            description (str): Humanized character description.
+            style (Optional[str]): DALL·E 3 style, "vivid" or "natural"; the API default if None.
+            size (str): Image size, e.g. "1024x1024" or "1024x1792".
+            hint (Optional[str]): Extra prompt direction for a variant.
+
+        Returns:
+            Image: Generated image entry, holding b64_json or url depending on image_response_format.
+        """
+        options = {"style": style} if style else {}
+        with metrics.span("generate"):
+            response = await self.client.images.generate(
+                model=IMAGE_MODEL,
+                prompt=build_portrait_prompt(description, hint),
+                size=size,
+                quality=IMAGE_QUALITY,
+                response_format=self.image_response_format,
+                n=1,
+                **options
+            )
+        return response.data[0]
+
+    async def _download_image_bytes(self, url: str, max_bytes: int = DOWNLOAD_MAX_BYTES) -> bytes:
+        """
+        Stream a generated image from a URL, refusing bodies larger than max_bytes.
+
+        Args:
+            url (str): URL of the generated image.
+            max_bytes (int): Largest body accepted.
+
+        Returns:
+            bytes: Downloaded image bytes.
+        """
+        with metrics.span("download"):
+            async with self.http_client.stream("GET", url) as response:
+                response.raise_for_status()
+                content_length = response.headers.get("Content-Length")
+                if content_length is not None and int(content_length) > max_bytes:
+                    raise ValueError(f"Image download of {content_length} bytes exceeds the {max_bytes} byte limit.")
+
+                buffered = bytearray()
+                async for chunk in response.aiter_bytes():
+                    buffered.extend(chunk)
+                    if len(buffered) > max_bytes:
+                        raise ValueError(f"Image download exceeds the {max_bytes} byte limit.")
+                metrics.increment("deghiblify_bytes_total", len(buffered), direction="download")
+                return bytes(buffered)
+
+    async def _describe_stream(self, source: SourceImage,
+                               progress: Optional[ProgressReporter] = None) -> AsyncIterator[str]:
+        """
+        Produce the realistic description for an input image as it arrives, consulting the description cache.
+
+        Args:
+            source (SourceImage): Input image.
+            progress (Optional[ProgressReporter]): Receives the "encoded", "describing" and "described"
+                stage events; progress.partial_description grows as text arrives.
+
+        Yields:
+            str: Description text fragments, in order.
+        """
+        progress = ProgressReporter.wrap(progress)
+        description, cache_key = await self._run_blocking(self._lookup_description, source)
+        if description is not None:
+            progress.partial_description = progress.description = description
+            progress("described")
+            yield description
+            return
+
+        payload = await self._run_blocking(self._prepare_vision_payload, source)
+        progress.vision_payload = payload
+        progress("encoded")
+        if self.stream_descriptions:
+            async for text in self._stream_realistic_description(payload.data_url):
+                if not progress.partial_description:
+                    progress("describing")
+                progress.partial_description += text
+                yield text
+            description = progress.partial_description.strip()
+        else:
+            description = await self._get_realistic_description_from_gpt4o(payload.data_url)
+            progress.partial_description = description
+            yield description
+        progress.description = description
+        progress("described")
+        await self._run_blocking(self._store_description, cache_key, description)
+
+    async def _describe(self, source: SourceImage, progress: Optional[ProgressReporter] = None) -> str:
+        """
+        Get the realistic description for an input image, consulting the description cache.
+
+        Args:
+            source (SourceImage): Input image.
+            progress (Optional[ProgressReporter]): Receives the "encoded", "describing" and "described" stage events.
+
+        Returns:
+            str: Realistic character description.
+        """
+        progress = ProgressReporter.wrap(progress)
+        async for _ in self._describe_stream(source, progress):
+            pass
+        return progress.description
+
+    async def describe_image_stream(self, image: ImageInput,
+                                    progress: Optional[Callable[[str, float], None]] = None) -> AsyncIterator[str]:
+        """
+        Describe how the character in an image would look as a real human, yielding the text as it arrives.
+
+        Args:
+            image (ImageInput): Input image as a file path, encoded bytes, binary file object,
+                PIL Image or SourceImage.
+            progress (Optional[Callable[[str, float], None]]): Called with each stage reached and the seconds elapsed.
+
+        Yields:
+            str: Description text fragments, in order.
+        """
+        source = await self._run_blocking(SourceImage.from_any, image)
+        async for text in self._describe_stream(source, ProgressReporter.wrap(progress)):
+            yield text
+
+    async def describe_image(self, image: ImageInput,
+                             progress: Optional[Callable[[str, float], None]] = None) -> str:
+        """
+        Describe how the character in an image would look as a real human.
+
+        Args:
+            image (ImageInput): Input image as a file path, encoded bytes, binary file object,
+                PIL Image or SourceImage.
+            progress (Optional[Callable[[str, float], None]]): Called with each stage reached and the seconds elapsed.
+
+        Returns:
+            str: Realistic character description.
+        """
+        progress = ProgressReporter.wrap(progress)
+        return await self._describe(await self._run_blocking(SourceImage.from_any, image), progress)
+
+    async def generate_from_description(self, description: str,
+                                        progress: Optional[Callable[[str, float], None]] = None,
+                                        style: Optional[str] = None, size: str = IMAGE_SIZE,
+                                        hint: Optional[str] = None) -> bytes:
+        """
+        Generate a new realistic portrait from an existing description.
+
+        Args:
+            description (str): Realistic character description, e.g. from describe_image.
+            progress (Optional[Callable[[str, float], None]]): Called with each stage reached and the seconds elapsed.
+            style (Optional[str]): DALL·E 3 style, "vivid" or "natural"; the API default if None.
+            size (str): Image size, e.g. "1024x1024" or "1024x1792".
+            hint (Optional[str]): Extra prompt direction, e.g. a lighting change.
+
+        Returns:
+            bytes: Encoded bytes of the generated realistic portrait.
+        """
+        progress = ProgressReporter.wrap(progress)
+        generated = await self._generate_dalle_image(description, style=style, size=size, hint=hint)
+        progress("generated")
+        if generated.b64_json is not None:
+            metrics.increment("deghiblify_bytes_total", len(generated.b64_json), direction="download")
+            return await self._run_blocking(base64.b64decode, generated.b64_json)
+
+        generated_image = await self._download_image_bytes(generated.url)
+        progress("downloaded")
+        return generated_image
+
+    async def deghiblify_image(self, image: ImageInput,
+                               progress: Optional[Callable[[str, float], None]] = None) -> bytes:
+        """
+        Transform a Ghibli-style anime character image into a realistic human version.
+
+        Args:
+            image (ImageInput): Input image as a file path, encoded bytes, binary file object,
+                PIL Image or SourceImage.
+            progress (Optional[Callable[[str, float], None]]): Called with each stage reached
+                ("encoded", "described", "generated", "downloaded" for URL responses, or "cached")
+                and the seconds elapsed.
+
+        Returns:
+            bytes: Encoded bytes of the generated realistic portrait.
+        """
+        progress = ProgressReporter.wrap(progress)
+        source = await self._run_blocking(SourceImage.from_any, image)
+
+        cached, cache_key, image_hash = await self._run_blocking(self._lookup_result, source)
+        if cached is not None:
+            progress("cached")
+            return cached
+
+        description = await self._describe(source, progress)
+        generated_image = await self.generate_from_description(description, progress)
+        await self._run_blocking(self._store_result, cache_key, image_hash, generated_image)
+        return generated_image
+
+    async def generate_variants(self, image: ImageInput, count: int = 4, variants: Optional[List[dict]] = None,
+                                progress: Optional[Callable[[str, float], None]] = None
+                                ) -> AsyncIterator[Tuple[int, Union[bytes, BaseException]]]:
+        """
+        Describe an image once, then generate several portraits from the description concurrently.
+
+        Args:
+            image (ImageInput): Input image as a file path, encoded bytes, binary file object,
+                PIL Image or SourceImage.
+            count (int): Number of variants when variants is not given.
+            variants (Optional[List[dict]]): Per-variant generate_from_description arguments
+                (style, size, hint); defaults to default_variants(count).
+            progress (Optional[Callable[[str, float], None]]): Called with "encoded" and "described",
+                then "variant" as each portrait finishes.
+
+        Yields:
+            Tuple[int, Union[bytes, BaseException]]: Variant index and its image bytes, or the exception
+                raised, in completion order.
+        """
+        progress = ProgressReporter.wrap(progress)
+        variants = variants if variants is not None else default_variants(count)
+        source = await self._run_blocking(SourceImage.from_any, image)
+        description = await self._describe(source, progress)
+
+        async def run(index, variant):
+            try:
+                return index, await self.generate_from_description(description, **variant)
+            except Exception as e:
+                return index, e
+
+        for finished in asyncio.as_completed([run(index, variant) for index, variant in enumerate(variants)]):
+            index, result = await finished
+            progress.variants[index] = result
+            progress("variant")
+            yield index, result
+
+    async def deghiblify_many(self, images: List[ImageInput],
+                              concurrency: int = 8) -> List[Union[bytes, BaseException]]:
+        """
+        Transform several images concurrently.
+
+        Args:
+            images (List[ImageInput]): Input images, e.g. file paths or encoded bytes.
+            concurrency (int): Maximum number of transformations in flight at once.
+
+        Returns:
+            List[Union[bytes, BaseException]]: Generated image bytes, or the exception raised, for each input in order.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(image):
+            async with semaphore:
+                return await self.deghiblify_image(image)
+
+        return await asyncio.gather(*(run(image) for image in images), return_exceptions=True)
+
+    async def close(self) -> None:
+        """Close the underlying HTTP connections."""
+        await self.client.close()
+        await self.http_client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+# Example usage:
+# if __name__ == "__main__":
+#     async def main():
+#         async with AsyncOpenAIClient() as client:  # reads OPENAI_API_KEY from the environment
+#             results = await client.deghiblify_many(["a.png", "b.png"], concurrency=4)
+#             print([len(r) if isinstance(r, bytes) else r for r in results])
+#     asyncio.run(main())
@@ -0,0 +1,173 @@
+"""
+Run DeGhiblify over a directory or glob of images without the Streamlit app.
+
+Usage:
+    python -m src.batch images/ "more/*.png" --output-dir output --describe-workers 4 --generate-workers 2
+
+Progress is appended to a JSONL manifest (output-dir/manifest.jsonl by default);
+re-running the same command skips every input already recorded as done.
+"""
+import os
+import sys
+import glob
+import json
+import hashlib
+import time
+import argparse
+from io import BytesIO
+from PIL import Image
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.openai_client import OpenAIClient
+from src.pipeline import PipelineExecutor
+from src.cache import create_result_cache, create_description_cache
+from src.rate_limiter import create_rate_limiter
+from src.utils import load_env_variables, is_valid_image_file, generate_output_filename, handle_api_error
+
+
+def collect_inputs(patterns):
+    """Expand directories and glob patterns into a sorted list of image paths."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = (os.path.join(pattern, name) for name in os.listdir(pattern))
+        else:
+            candidates = glob.glob(pattern, recursive=True)
+        paths.update(os.path.abspath(path) for path in candidates if os.path.isfile(path) and is_valid_image_file(path))
+    return sorted(paths)
+
+
+def load_completed(manifest_path):
+    """Return the set of input paths recorded as done in a manifest."""
+    completed = set()
+    if not os.path.exists(manifest_path):
+        return completed
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A partially written last line from an interrupted run
+                continue
+            if record.get("status") == "done":
+                completed.add(record["input"])
+    return completed
+
+
+def percentile(values, fraction):
+    """Return the value at the given fraction of a sorted list."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def save_result(result, output_dir):
+    """
+    Save a generated image next to its siblings, returning the output path.
+
+    The name carries a short digest of the input path, so inputs sharing a basename
+    (a/frame.png and b/frame.png) that finish within the same second get separate files.
+    An existing file is never overwritten; FileExistsError is raised instead.
+    """
+    base_name, ext = os.path.splitext(generate_output_filename(result.input_path))
+    path_digest = hashlib.sha256(result.input_path.encode("utf-8")).hexdigest()[:8]
+    output_path = os.path.join(output_dir, f"{base_name}_{path_digest}{ext}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    image = Image.open(BytesIO(result.output))
+    with open(output_path, "xb") as f:
+        try:
+            image.save(f, format=Image.registered_extensions()[ext.lower()])
+        except BaseException:
+            f.close()
+            os.remove(output_path)
+            raise
+    return output_path
+
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="Image files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", default="output", help="Directory for generated images")
+    parser.add_argument("--describe-workers", type=positive_int, default=4, help="Concurrent GPT-4o description calls")
+    parser.add_argument("--generate-workers", type=positive_int, default=2, help="Concurrent DALL·E generations")
+    parser.add_argument("--queue-size", type=positive_int, default=8, help="Descriptions buffered ahead of the generators")
+    parser.add_argument("--manifest", help="Progress manifest path (default: OUTPUT_DIR/manifest.jsonl)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the result and description caches")
+    args = parser.parse_args(argv)
+
+    manifest_path = args.manifest or os.path.join(args.output_dir, "manifest.jsonl")
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+
+    inputs = collect_inputs(args.inputs)
+    completed = load_completed(manifest_path)
+    pending = [path for path in inputs if path not in completed]
+    print(f"{len(inputs)} images found, {len(inputs) - len(pending)} already done, {len(pending)} to process")
+    if not pending:
+        return 0
+
+    env = load_env_variables()
+    if args.no_cache:
+        client = OpenAIClient(api_key=env["OPENAI_API_KEY"], rate_limiter=create_rate_limiter())
+    else:
+        client = OpenAIClient(
+            api_key=env["OPENAI_API_KEY"],
+            cache=create_result_cache(),
+            description_cache=create_description_cache(),
+            rate_limiter=create_rate_limiter()
+        )
+
+    executor = PipelineExecutor(
+        client,
+        describe_workers=args.describe_workers,
+        generate_workers=args.generate_workers,
+        queue_size=args.queue_size
+    )
+    latencies = []
+    failures = 0
+
+    started = time.perf_counter()
+    with open(manifest_path, "a", encoding="utf-8") as manifest:
+        try:
+            for i, result in enumerate(executor.run(pending), 1):
+                record = {"input": result.input_path, "latency": result.latency, "cached": result.cached}
+                try:
+                    if result.error is not None:
+                        raise result.error
+                    record.update(status="done", output=save_result(result, args.output_dir))
+                    latencies.append(result.latency)
+                except Exception as e:
+                    record.update(status="failed", error=handle_api_error(e))
+                    failures += 1
+
+                manifest.write(json.dumps(record) + "\n")
+                manifest.flush()
+                print(f"[{i}/{len(pending)}] {record['status']}: {record['input']}"
+                      + (f" ({record['error']})" if record["status"] == "failed" else "")
+                      + f" | {executor.summary()}")
+        except KeyboardInterrupt:
+            print("Interrupted; re-run the same command to resume.")
+            raise
+
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f"\nDone: {len(latencies)} succeeded, {failures} failed in {elapsed:.1f}s")
+    print(f"Throughput: {len(latencies) / elapsed * 60:.1f} images/minute")
+    print(f"Stages: {executor.summary()}")
+    if latencies:
+        print(f"Latency: p50 {percentile(latencies, 0.5):.1f}s, p95 {percentile(latencies, 0.95):.1f}s, "
+              f"max {latencies[-1]:.1f}s")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+import os
+import sys
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import (
+    CACHE_DIR, CACHE_MEMORY_ITEMS, CACHE_MAX_BYTES, CACHE_TTL_SECONDS,
+    DESCRIPTION_CACHE_DIR, DESCRIPTION_CACHE_MEMORY_ITEMS, DESCRIPTION_CACHE_MAX_BYTES,
+)
+
+
+def make_cache_key(data: bytes, **params) -> str:
+    """
+    Build a content-addressed cache key from raw bytes and the parameters that affect the output.
+
+    Args:
+        data (bytes): Raw input bytes (e.g. the uploaded image file).
+        **params: Model names, prompts and other settings that change the result.
+
+    Returns:
+        str: Hex SHA-256 digest identifying this input/parameter combination.
+    """
+    digest = hashlib.sha256()
+    digest.update(data)
+    for name in sorted(params):
+        digest.update(b"\0")
+        digest.update(name.encode("utf-8"))
+        digest.update(b"=")
+        digest.update(str(params[name]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class MemoryCache:
+    """Thread-safe in-memory LRU cache for byte values."""
+
+    def __init__(self, max_items: int = 128):
+        """
+        Initialize the memory cache.
+
+        Args:
+            max_items (int): Maximum number of entries kept before the least recently used is evicted.
+        """
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value for key, or None if it is not cached."""
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        """Store a value, evicting the least recently used entries if full."""
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Remove a value from the cache if present."""
+        with self._lock:
+            self._items.pop(key, None)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DiskCache:
+    """On-disk cache for byte values with total size and TTL eviction."""
+
+    def __init__(self, directory: str, max_bytes: int = 1024 ** 3, ttl_seconds: Optional[float] = None):
+        """
+        Initialize the disk cache.
+
+        Args:
+            directory (str): Directory where cache entries are stored.
+            max_bytes (int): Maximum total size of all entries before the least recently used are evicted.
+            ttl_seconds (Optional[float]): Entries not accessed for this many seconds are treated as expired.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _is_expired(self, mtime: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - mtime > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value for key, or None if it is missing or expired."""
+        path = self._path(key)
+        try:
+            if self._is_expired(os.path.getmtime(path)):
+                self.delete(key)
+                return None
+            with open(path, "rb") as f:
+                value = f.read()
+            # Touch the entry so eviction and TTL follow last access
+            os.utime(path, None)
+            return value
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        """Store a value atomically, then evict entries until the cache fits in max_bytes."""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        """Remove a value from the cache if present."""
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        """Drop expired entries, then the least recently used ones until under max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.is_file() or entry.name.startswith(".tmp-"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if self._is_expired(stat.st_mtime):
+                    self.delete(entry.name)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.name))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, name in entries:
+                if total <= self.max_bytes:
+                    break
+                self.delete(name)
+                total -= size
+
+
+class TieredCache:
+    """Cache that checks a fast memory tier before falling back to a disk tier."""
+
+    def __init__(self, memory: Optional[MemoryCache] = None, disk: Optional[DiskCache] = None):
+        """
+        Initialize the tiered cache.
+
+        Args:
+            memory (Optional[MemoryCache]): In-memory LRU tier.
+            disk (Optional[DiskCache]): Persistent disk tier.
+        """
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value, promoting disk hits into memory."""
+        if self.memory is not None:
+            value = self.memory.get(key)
+            if value is not None:
+                return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                if self.memory is not None:
+                    self.memory.set(key, value)
+                return value
+        return None
+
+    def set(self, key: str, value: bytes) -> None:
+        """Store a value in every tier."""
+        if self.memory is not None:
+            self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def delete(self, key: str) -> None:
+        """Remove a value from every tier."""
+        if self.memory is not None:
+            self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+
+def create_result_cache() -> TieredCache:
+    """Create the generated-image cache configured in config.settings."""
+    return TieredCache(
+        memory=MemoryCache(max_items=CACHE_MEMORY_ITEMS),
+        disk=DiskCache(CACHE_DIR, max_bytes=CACHE_MAX_BYTES, ttl_seconds=CACHE_TTL_SECONDS),
+    )
+
+
+def create_description_cache() -> TieredCache:
+    """Create the description cache configured in config.settings."""
+    return TieredCache(
+        memory=MemoryCache(max_items=DESCRIPTION_CACHE_MEMORY_ITEMS),
+        disk=DiskCache(DESCRIPTION_CACHE_DIR, max_bytes=DESCRIPTION_CACHE_MAX_BYTES, ttl_seconds=CACHE_TTL_SECONDS),
+    )
@@ -0,0 +1,149 @@
+import os
+import sys
+import functools
+import importlib.util
+from io import BytesIO
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+from PIL import Image
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.cache import MemoryCache, make_cache_key
+from src.image_processor import MIME_TYPES
+from src.metrics import metrics
+from config.settings import OUTPUT_FORMAT, OUTPUT_QUALITY, OUTPUT_ENCODE_WORKERS, OUTPUT_CACHE_ITEMS
+
+ORIGINAL = "ORIGINAL"
+OUTPUT_FORMATS = (ORIGINAL, "WEBP", "AVIF", "JPEG", "PNG")
+LOSSY_FORMATS = ("WEBP", "AVIF", "JPEG")
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "AVIF": ".avif", "GIF": ".gif"}
+
+
+@functools.lru_cache(maxsize=None)
+def avif_supported() -> bool:
+    """Whether Pillow can write AVIF, natively or through the optional pillow-avif-plugin package."""
+    if importlib.util.find_spec("pillow_avif") is not None:
+        # Importing the plugin registers its AVIF encoder with Pillow
+        import pillow_avif  # noqa: F401
+    Image.init()
+    return "AVIF" in Image.SAVE
+
+
+def available_formats() -> tuple:
+    """OUTPUT_FORMATS this Pillow build can actually write, for offering in a UI."""
+    return tuple(format for format in OUTPUT_FORMATS if format != "AVIF" or avif_supported())
+
+
+class EncodedImage:
+    """Encoded image bytes and the format they are in."""
+
+    def __init__(self, data: bytes, format: str):
+        self.data = data
+        self.format = format
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES.get(self.format, "application/octet-stream")
+
+    @property
+    def extension(self) -> str:
+        return EXTENSIONS.get(self.format, "")
+
+
+class ImageEncoder:
+    """
+    Encodes generated images for download, on a thread pool and cached by content digest.
+
+    The ORIGINAL format, or the format the image is already in when that is lossless, hands
+    back the generated bytes themselves without decoding them. Other formats are encoded once
+    per image, format and quality and then served from the cache.
+    """
+
+    def __init__(self, max_workers: int = 2, cache: Optional[MemoryCache] = None):
+        """
+        Initialize the encoder.
+
+        Args:
+            max_workers (int): Encodes running at once.
+            cache (Optional[MemoryCache]): Cache for encoded bytes; None disables caching.
+        """
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="deghiblify-encode")
+
+    @staticmethod
+    def resolve_format(format: str) -> str:
+        """Return the format that will actually be written, falling back from AVIF to WebP when unsupported."""
+        format = format.upper()
+        if format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {format}")
+        if format == "AVIF" and not avif_supported():
+            return "WEBP"
+        return format
+
+    def submit(self, data: bytes, format: str = OUTPUT_FORMAT, quality: int = OUTPUT_QUALITY) -> "Future[EncodedImage]":
+        """
+        Start encoding an image, returning a future for the result.
+
+        Args:
+            data (bytes): Encoded source image, e.g. the generated PNG.
+            format (str): One of OUTPUT_FORMATS.
+            quality (int): Quality for lossy formats (1-100); ignored for PNG and ORIGINAL.
+
+        Returns:
+            Future[EncodedImage]: Completed immediately for passthrough and cache hits.
+        """
+        format = self.resolve_format(format)
+        source_format = Image.open(BytesIO(data)).format
+        future = Future()
+        if format == ORIGINAL or (format == source_format and format not in LOSSY_FORMATS):
+            future.set_result(EncodedImage(data, source_format))
+            return future
+
+        quality = quality if format in LOSSY_FORMATS else None
+        key = make_cache_key(data, format=format, quality=quality)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            future.set_result(EncodedImage(cached, format))
+            return future
+        return self._executor.submit(self._encode, data, format, quality, key)
+
+    def encode(self, data: bytes, format: str = OUTPUT_FORMAT, quality: int = OUTPUT_QUALITY) -> EncodedImage:
+        """Encode an image and wait for the result; see submit."""
+        return self.submit(data, format, quality).result()
+
+    def encode_many(self, images: List[bytes], format: str = OUTPUT_FORMAT, quality: int = OUTPUT_QUALITY) -> List[EncodedImage]:
+        """Encode several images concurrently, returning them in order."""
+        futures = [self.submit(data, format, quality) for data in images]
+        return [future.result() for future in futures]
+
+    def _encode(self, data: bytes, format: str, quality: Optional[int], key: str) -> EncodedImage:
+        with metrics.span("output_encode"):
+            image = Image.open(BytesIO(data))
+            if format == "JPEG":
+                image = image.convert("RGB")
+                options = {"quality": quality, "optimize": True, "progressive": True}
+            elif format == "PNG":
+                options = {}
+            else:
+                options = {"quality": quality}
+            buffered = BytesIO()
+            image.save(buffered, format=format, **options)
+            encoded = buffered.getvalue()
+        metrics.increment("deghiblify_output_bytes_total", len(encoded), format=format)
+        if self.cache is not None:
+            self.cache.set(key, encoded)
+        return EncodedImage(encoded, format)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the encoding threads."""
+        self._executor.shutdown(wait=wait)
+
+
+def create_image_encoder() -> ImageEncoder:
+    """Create the download encoder configured in config.settings."""
+    return ImageEncoder(
+        max_workers=OUTPUT_ENCODE_WORKERS,
+        cache=MemoryCache(max_items=OUTPUT_CACHE_ITEMS)
+    )
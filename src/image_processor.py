@@ -1,25 +1,323 @@
 import os
+import math
 import requests
-from PIL import Image
+import numpy as np
+from PIL import Image, ImageDraw, ImageOps
 from io import BytesIO
 import base64
 import sys
+import functools
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import BinaryIO, Union
 
 # Add the parent directory to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.settings import IMAGE_OUTPUT_SIZE
+from src.metrics import metrics
+from config.settings import (
+    IMAGE_OUTPUT_SIZE, VISION_MAX_SIDE, VISION_SHORT_SIDE, VISION_JPEG_QUALITY,
+    VISION_CROP_TO_SUBJECT, VISION_CROP_MARGIN, VISION_CROP_MAX_AREA,
+    UPLOAD_MAX_BYTES, IMAGE_MAX_PIXELS, DECODE_MAX_SIDE,
+    DOWNLOAD_TIMEOUT, DOWNLOAD_MAX_BYTES, DOWNLOAD_POOL_SIZE,
+    THUMBNAIL_MAX_SIDE, THUMBNAIL_FORMAT, THUMBNAIL_QUALITY,
+    BATCH_CODEC_WORKERS, BATCH_SIZE,
+)
+
+MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif", "AVIF": "image/avif"}
+
+_session = None
+_session_lock = threading.Lock()
+_codec_pool = None
+_codec_pool_lock = threading.Lock()
+
+
+class ImageTooLarge(ValueError):
+    """Raised when an input image exceeds the configured byte or pixel limits."""
+
+
+def get_http_session():
+    """Return the process-wide requests session, so downloads reuse pooled keep-alive connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=DOWNLOAD_POOL_SIZE, pool_maxsize=DOWNLOAD_POOL_SIZE)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def get_codec_pool():
+    """
+    Return the process-wide pool for encoding work, started on first use.
+
+    Workers are started with forkserver (spawn where that is unavailable) rather than
+    fork: callers such as the Streamlit app and job workers are multi-threaded, and a
+    forked child can inherit locks held by other threads and deadlock.
+    """
+    global _codec_pool
+    with _codec_pool_lock:
+        if _codec_pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _codec_pool = ProcessPoolExecutor(max_workers=BATCH_CODEC_WORKERS, mp_context=multiprocessing.get_context(method))
+        return _codec_pool
+
+
+def _encode_image(image, format, save_options):
+    """Encode one image; module-level so codec pool workers can unpickle it."""
+    buffered = BytesIO()
+    image.save(buffered, format=format, **save_options)
+    return buffered.getvalue()
+
+
+def _bounded_map(executor, func, items, window):
+    """Yield func(item) for each item in input order, with at most window calls in flight."""
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # The consumer stopped early; drop work that has not started
+        for future in pending:
+            future.cancel()
+
+
+def _batches(items, size):
+    """Group an iterable into lists of at most size items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _check_limits(byte_size, dimensions, max_bytes, max_pixels):
+    """Raise ImageTooLarge if an encoded size or (width, height) exceeds the limits; None skips a check."""
+    if max_bytes is not None and byte_size is not None and byte_size > max_bytes:
+        raise ImageTooLarge(f"Image of {byte_size} bytes exceeds the {max_bytes} byte limit.")
+    if max_pixels is not None and dimensions is not None and dimensions[0] * dimensions[1] > max_pixels:
+        raise ImageTooLarge(f"Image of {dimensions[0]}x{dimensions[1]} pixels exceeds the {max_pixels} pixel limit.")
+
+
+def estimate_vision_tokens(width, height):
+    """Estimate GPT-4o high-detail input tokens for an image of the given size."""
+    # The API fits the image in 2048x2048, scales the short side to 768, then bills 512px tiles
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def _box_blur(values, radius):
+    """Mean filter over a (2 * radius + 1) square window using running sums along each axis."""
+    size = 2 * radius + 1
+    for axis in (0, 1):
+        pad = [(0, 0), (0, 0)]
+        pad[axis] = (radius + 1, radius)
+        sums = np.cumsum(np.pad(values, pad, mode="edge"), axis=axis)
+        upper = [slice(None), slice(None)]
+        lower = [slice(None), slice(None)]
+        upper[axis] = slice(size, None)
+        lower[axis] = slice(None, -size)
+        values = (sums[tuple(upper)] - sums[tuple(lower)]) / size
+    return values
+
+
+class VisionPayload:
+    """An image encoded for the vision API, with the savings over the original upload."""
+
+    def __init__(self, base64_data, mime_type, size, original_bytes, original_size, crop_box=None):
+        self.base64_data = base64_data
+        self.mime_type = mime_type
+        self.size = size
+        self.encoded_bytes = len(base64_data) * 3 // 4
+        self.original_bytes = original_bytes
+        self.tokens = estimate_vision_tokens(*size)
+        self.original_tokens = estimate_vision_tokens(*original_size)
+        # (left, top, right, bottom) of the subject crop in the EXIF-rotated original, or None for the full frame
+        self.crop_box = crop_box
+
+    @property
+    def data_url(self):
+        return f"data:{self.mime_type};base64,{self.base64_data}"
+
+    @property
+    def bytes_saved(self):
+        return self.original_bytes - self.encoded_bytes
+
+    @property
+    def tokens_saved(self):
+        return self.original_tokens - self.tokens
+
+
+class SourceImage:
+    """An input image held as its encoded bytes, decoded at most once and shared by every stage."""
+
+    def __init__(self, data, image=None):
+        """
+        Args:
+            data: Encoded image bytes (bytes or any buffer, e.g. a memoryview).
+            image: Already decoded PIL Image for these bytes, if the caller has one.
+        """
+        self.data = data
+        self._image = image
+        self._size = image.size if image is not None else None
+
+    @classmethod
+    def from_any(cls, source):
+        """Wrap a file path, bytes-like object, binary file object or PIL Image without extra copies."""
+        if isinstance(source, cls):
+            return source
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return cls(source)
+        if isinstance(source, Image.Image):
+            buffered = BytesIO()
+            source.save(buffered, format=source.format or "PNG")
+            return cls(buffered.getbuffer(), image=source)
+        if isinstance(source, BytesIO):
+            # Covers Streamlit's UploadedFile; getbuffer() shares the upload's memory
+            return cls(source.getbuffer())
+        if hasattr(source, "read"):
+            return cls(source.read())
+        with open(source, "rb") as f:
+            return cls(f.read())
+
+    @property
+    def image(self):
+        """The decoded PIL Image, loaded on first access within the configured limits (see ImageProcessor.load_image)."""
+        if self._image is None:
+            self._image = ImageProcessor.load_image(BytesIO(self.data))
+        return self._image
+
+    @property
+    def size(self):
+        """Full-resolution (width, height), read from the image header without decoding."""
+        if self._size is None:
+            try:
+                self._size = Image.open(BytesIO(self.data)).size
+            except Image.DecompressionBombError as e:
+                raise ImageTooLarge(str(e)) from e
+        return self._size
+
+    def check_limits(self, max_bytes=UPLOAD_MAX_BYTES, max_pixels=IMAGE_MAX_PIXELS):
+        """Raise ImageTooLarge if the image is over the limits load_image enforces, without decoding it."""
+        _check_limits(len(self), self.size, max_bytes, max_pixels)
+
+    def __len__(self):
+        return len(self.data)
+
+
+# Anything SourceImage.from_any accepts
+ImageInput = Union[str, bytes, memoryview, BinaryIO, Image.Image, SourceImage]
+
 
 class ImageProcessor:
     @staticmethod
-    def load_image(image_path):
-        """Load an image from a file path."""
-        return Image.open(image_path)
+    def load_image(image_path, max_side=DECODE_MAX_SIDE, max_pixels=IMAGE_MAX_PIXELS, max_bytes=UPLOAD_MAX_BYTES):
+        """
+        Load an image from a file path or binary file object, decoding no more pixels than needed.
+        
+        The file size and the pixel count in the header are checked before any pixel data is
+        decoded. JPEGs larger than max_side are decoded straight to a 1/2, 1/4 or 1/8 scale
+        (draft mode), and every image is then reduced in place to fit max_side, so a
+        50-megapixel photo never holds its full-resolution pixels in memory.
+        
+        Args:
+            image_path: File path or seekable binary file object.
+            max_side (int): Longest side of the decoded image; None keeps the full resolution.
+            max_pixels (int): Largest width * height accepted; None disables the check.
+            max_bytes (int): Largest encoded size accepted; None disables the check.
+            
+        Returns:
+            PIL.Image.Image: The loaded image, keeping its format and EXIF metadata.
+            
+        Raises:
+            ImageTooLarge: If the input exceeds max_bytes or max_pixels.
+        """
+        if max_bytes is not None:
+            if isinstance(image_path, (str, os.PathLike)):
+                size = os.path.getsize(image_path)
+            else:
+                position = image_path.tell()
+                size = image_path.seek(0, os.SEEK_END) - position
+                image_path.seek(position)
+            _check_limits(size, None, max_bytes, max_pixels)
+        
+        try:
+            # Reads the header only
+            image = Image.open(image_path)
+        except Image.DecompressionBombError as e:
+            raise ImageTooLarge(str(e)) from e
+        width, height = image.size
+        _check_limits(None, image.size, max_bytes, max_pixels)
+        
+        if max_side is not None and max(width, height) > max_side:
+            scale = max_side / max(width, height)
+            image.draft(None, (max(1, int(width * scale)), max(1, int(height * scale))))
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+        else:
+            image.load()
+        return image
     
     @staticmethod
     def resize_image(image, size=IMAGE_OUTPUT_SIZE):
         """Resize an image to the specified dimensions."""
         return image.resize(size)
     
+    @staticmethod
+    def resize_images(images, size=IMAGE_OUTPUT_SIZE, workers=BATCH_CODEC_WORKERS):
+        """Resize many images on a thread pool (Pillow releases the GIL while resampling), yielding them in order."""
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            yield from _bounded_map(pool, lambda image: image.resize(size), images, window=2 * workers)
+    
+    @staticmethod
+    def normalize_images(images, size=IMAGE_OUTPUT_SIZE, mean=None, std=None, batch_size=BATCH_SIZE):
+        """
+        Stack images into float32 arrays scaled to [0, 1], optionally standardized per channel.
+        
+        Args:
+            images: Images of any size and mode; each is converted to RGB and resized to size.
+            size (tuple): (width, height) of every image in the stack.
+            mean (tuple): Per-channel mean subtracted after scaling, e.g. (0.485, 0.456, 0.406).
+            std (tuple): Per-channel standard deviation divided out after subtracting the mean.
+            batch_size (int): Images per yielded array.
+            
+        Returns:
+            Iterator[np.ndarray]: Arrays of shape (n, height, width, 3), n <= batch_size.
+        """
+        mean = np.asarray(mean if mean is not None else 0.0, dtype=np.float32)
+        std = np.asarray(std if std is not None else 1.0, dtype=np.float32)
+        # Fold the 1/255 scaling into the standardization so each stack is normalized in one pass
+        scale = 1.0 / (255.0 * std)
+        offset = mean / std
+        for batch in _batches(ImageProcessor.resize_images((image.convert("RGB") for image in images), size), batch_size):
+            stack = np.stack([np.asarray(image) for image in batch]).astype(np.float32)
+            stack *= scale
+            stack -= offset
+            yield stack
+    
+    @staticmethod
+    @metrics.timed("thumbnail")
+    def make_thumbnail(image, max_side=THUMBNAIL_MAX_SIDE, format=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY):
+        """Encode a display-sized copy of an image, returning the encoded bytes."""
+        thumbnail = image.copy()
+        thumbnail.thumbnail((max_side, max_side), Image.LANCZOS)
+        if format == "JPEG" and thumbnail.mode not in ("RGB", "L"):
+            thumbnail = thumbnail.convert("RGB")
+        buffered = BytesIO()
+        thumbnail.save(buffered, format=format, quality=quality)
+        return buffered.getvalue()
+    
     @staticmethod
     def save_image(image, output_path):
         """Save an image to the specified path."""
@@ -27,25 +325,191 @@ class ImageProcessor:
         image.save(output_path)
         return output_path
     
+    @staticmethod
+    @metrics.timed("download")
+    def download_image_bytes(url, max_bytes=DOWNLOAD_MAX_BYTES, timeout=DOWNLOAD_TIMEOUT):
+        """Download the raw bytes of an image from a URL, refusing bodies larger than max_bytes."""
+        with get_http_session().get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            content_length = response.headers.get("Content-Length")
+            if content_length is not None and int(content_length) > max_bytes:
+                raise ValueError(f"Image download of {content_length} bytes exceeds the {max_bytes} byte limit.")
+            
+            buffered = BytesIO()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                buffered.write(chunk)
+                if buffered.tell() > max_bytes:
+                    raise ValueError(f"Image download exceeds the {max_bytes} byte limit.")
+            metrics.increment("deghiblify_bytes_total", buffered.tell(), direction="download")
+            return buffered.getvalue()
+    
     @staticmethod
     def download_image_from_url(url, output_path=None):
         """Download an image from a URL and optionally save it."""
-        response = requests.get(url)
-        image = Image.open(BytesIO(response.content))
+        image = Image.open(BytesIO(ImageProcessor.download_image_bytes(url)))
         
         if output_path:
             return ImageProcessor.save_image(image, output_path)
         return image
     
     @staticmethod
-    def image_to_base64(image):
+    def image_to_base64(image, format="JPEG", **save_options):
         """Convert a PIL Image to base64 string."""
         buffered = BytesIO()
-        image.save(buffered, format="JPEG")
-        return base64.b64encode(buffered.getvalue()).decode('utf-8')
+        image.save(buffered, format=format, **save_options)
+        return base64.b64encode(buffered.getbuffer()).decode('utf-8')
+    
+    @staticmethod
+    def vision_input_size(size, max_side=VISION_MAX_SIDE, short_side=VISION_SHORT_SIDE):
+        """Return the largest size worth sending to the vision model, never upscaling."""
+        width, height = size
+        scale = min(1.0, max_side / max(width, height), short_side / min(width, height))
+        return max(1, round(width * scale)), max(1, round(height * scale))
+    
+    @staticmethod
+    def subject_region(image, margin=VISION_CROP_MARGIN, max_area=VISION_CROP_MAX_AREA, analysis_side=256, mass=0.9):
+        """Locate the main subject by edge density, colour contrast and a centre prior; None means keep the full frame."""
+        small = image.convert("RGB")
+        small.thumbnail((analysis_side, analysis_side), Image.BILINEAR)
+        rgb = np.asarray(small, dtype=np.float32) / 255.0
+        height, width = rgb.shape[:2]
+        if min(height, width) < 16:
+            return None
+        
+        # Edge strength from central differences of luminance
+        gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+        gx = np.zeros_like(gray)
+        gy = np.zeros_like(gray)
+        gx[:, 1:-1] = gray[:, 2:] - gray[:, :-2]
+        gy[1:-1, :] = gray[2:, :] - gray[:-2, :]
+        # Colour distance from the frame's mean colour (frequency-tuned saliency)
+        contrast = np.linalg.norm(rgb - rgb.mean(axis=(0, 1)), axis=2)
+        radius = max(1, min(height, width) // 32)
+        saliency = _box_blur(np.hypot(gx, gy), radius) * _box_blur(contrast, radius)
+        # Characters are usually framed near the centre
+        ys = np.linspace(-1.0, 1.0, height, dtype=np.float32)[:, None]
+        xs = np.linspace(-1.0, 1.0, width, dtype=np.float32)[None, :]
+        saliency *= np.exp(-(xs ** 2 + ys ** 2))
+        
+        total = saliency.sum()
+        if total <= 0:
+            return None
+        # Smallest span along each axis holding the central share of the saliency mass
+        tail = (1.0 - mass) / 2
+        columns = np.cumsum(saliency.sum(axis=0)) / total
+        rows = np.cumsum(saliency.sum(axis=1)) / total
+        left, right = np.searchsorted(columns, tail), np.searchsorted(columns, 1.0 - tail) + 1
+        top, bottom = np.searchsorted(rows, tail), np.searchsorted(rows, 1.0 - tail) + 1
+        
+        # Back to full resolution, with a margin so hair and outfit edges are kept
+        scale_x, scale_y = image.width / width, image.height / height
+        pad_x, pad_y = (right - left) * margin, (bottom - top) * margin
+        box = (
+            max(0, int((left - pad_x) * scale_x)),
+            max(0, int((top - pad_y) * scale_y)),
+            min(image.width, int(math.ceil((right + pad_x) * scale_x))),
+            min(image.height, int(math.ceil((bottom + pad_y) * scale_y))),
+        )
+        if (box[2] - box[0]) * (box[3] - box[1]) > max_area * image.width * image.height:
+            return None
+        return box
+    
+    @staticmethod
+    def draw_region_overlay(image, box, color=(139, 92, 246)):
+        """Return a copy of an image with a crop box outlined, for debugging subject detection."""
+        overlay = image.convert("RGB")
+        ImageDraw.Draw(overlay).rectangle(box, outline=color, width=max(2, min(image.size) // 150))
+        return overlay
+    
+    @staticmethod
+    @metrics.timed("encode")
+    def prepare_vision_payload(image, original_bytes=0, jpeg_quality=VISION_JPEG_QUALITY, crop=VISION_CROP_TO_SUBJECT,
+                               original_size=None):
+        """Crop to the subject, downscale, strip metadata and encode an image in its smallest suitable format for the vision API."""
+        # The image may have been reduced on load; savings are reported against the upload's own size
+        original_size = original_size or image.size
+        # Apply the EXIF orientation before the metadata is dropped
+        image = ImageOps.exif_transpose(image)
+        crop_box = ImageProcessor.subject_region(image) if crop else None
+        if crop_box is not None:
+            image = image.crop(crop_box)
+        target_size = ImageProcessor.vision_input_size(image.size)
+        if target_size != image.size:
+            image = image.resize(target_size, Image.LANCZOS)
+        
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+        candidates = []
+        if has_alpha:
+            candidates.append(("PNG", image, {"optimize": True}))
+        else:
+            rgb_image = image if image.mode in ("RGB", "L") else image.convert("RGB")
+            candidates.append(("JPEG", rgb_image, {"quality": jpeg_quality, "optimize": True}))
+            if image.mode in ("P", "L", "1"):
+                # Flat, low-colour artwork often compresses better losslessly
+                candidates.append(("PNG", image, {"optimize": True}))
+        
+        format, base64_data = min(
+            ((fmt, ImageProcessor.image_to_base64(img, format=fmt, **options)) for fmt, img, options in candidates),
+            key=lambda candidate: len(candidate[1])
+        )
+        metrics.increment("deghiblify_bytes_total", len(base64_data), direction="upload")
+        return VisionPayload(base64_data, MIME_TYPES[format], image.size, original_bytes, original_size, crop_box)
+    
+    @staticmethod
+    def encode_images(images, format="JPEG", workers=BATCH_CODEC_WORKERS, **save_options):
+        """
+        Encode many images in parallel on the codec process pool, yielding the encoded bytes in order.
+        
+        Encoders hold the GIL for much of their work, so they run in separate processes. Each
+        image is pickled to its worker, which costs a copy of its pixels, so this pays off for
+        many images on several cores rather than for a few small ones. At most 2 * workers
+        images are in flight, so a long input stream is never held in memory at once.
+        
+        Args:
+            images: Images to encode, e.g. a generator.
+            format (str): Pillow format name.
+            workers (int): Parallel encodes, up to BATCH_CODEC_WORKERS (the shared pool's size);
+                0 encodes in the calling process.
+            **save_options: Passed to Image.save, e.g. quality=85.
+            
+        Returns:
+            Iterator[bytes]: Encoded images, in input order.
+        """
+        encode = functools.partial(_encode_image, format=format, save_options=save_options)
+        if workers <= 0:
+            return map(encode, images)
+        return _bounded_map(get_codec_pool(), encode, images, window=2 * workers)
+    
+    @staticmethod
+    def images_to_base64(images, format="JPEG", workers=BATCH_CODEC_WORKERS, **save_options):
+        """Convert many PIL Images to base64 strings; see encode_images."""
+        for encoded in ImageProcessor.encode_images(images, format=format, workers=workers, **save_options):
+            yield base64.b64encode(encoded).decode('utf-8')
     
     @staticmethod
     def base64_to_image(base64_string):
         """Convert a base64 string to PIL Image."""
         image_data = base64.b64decode(base64_string)
-        return Image.open(BytesIO(image_data))
\ No newline at end of file
+        return Image.open(BytesIO(image_data))
+    
+    @staticmethod
+    def perceptual_hash(image, hash_size=8):
+        """Compute a difference hash (dHash) that is stable across resizing and re-compression."""
+        gray = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+        pixels = np.asarray(gray, dtype=np.int16)
+        bits = pixels[:, 1:] > pixels[:, :-1]
+        return int.from_bytes(np.packbits(bits).tobytes(), "big")
+    
+    @staticmethod
+    def perceptual_hashes(images, hash_size=8, batch_size=BATCH_SIZE, workers=BATCH_CODEC_WORKERS):
+        """Compute perceptual_hash for many images: grayscale downscaling on a thread pool, then each batch's bits compared and packed as one array."""
+        def shrink(image):
+            return np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS))
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for batch in _batches(_bounded_map(pool, shrink, images, window=2 * workers), batch_size):
+                pixels = np.stack(batch).astype(np.int16)
+                bits = pixels[:, :, 1:] > pixels[:, :, :-1]
+                packed = np.packbits(bits.reshape(len(batch), -1), axis=1)
+                for row in packed:
+                    yield int.from_bytes(row.tobytes(), "big")
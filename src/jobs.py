@@ -0,0 +1,185 @@
+import os
+import sys
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.openai_client import ProgressReporter
+from config.settings import JOB_WORKERS, JOB_MAX_PENDING, JOB_RETENTION_SECONDS
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when a job is submitted while the queue already holds the maximum number of pending jobs."""
+
+
+class Job:
+    """A unit of background work with its status, timestamps, progress and outcome."""
+
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.status = QUEUED
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.progress = ProgressReporter(self._on_progress)
+
+    def _on_progress(self, stage: str, elapsed: float) -> None:
+        self.stage = stage
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    @property
+    def wait_seconds(self) -> float:
+        """Seconds spent queued before a worker picked the job up (so far, if still queued)."""
+        return (self.started_at or time.monotonic()) - self.submitted_at
+
+    @property
+    def run_seconds(self) -> float:
+        """Seconds spent running (so far, if still running)."""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+
+class JobQueue:
+    """
+    Bounded background worker pool for API work.
+
+    submit returns a job ID immediately, so the calling script thread is not held for
+    the duration of the API calls; callers poll get for the outcome. The pool size caps
+    concurrent API load across every session in the process, and the pending limit
+    rejects new work rather than letting waits grow without bound.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 32, retention_seconds: float = 3600):
+        """
+        Initialize the job queue.
+
+        Args:
+            max_workers (int): Number of jobs running at once.
+            max_pending (int): Maximum number of queued and running jobs before submit raises JobQueueFull.
+            retention_seconds (float): Finished jobs are forgotten this long after they complete.
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="deghiblify-job")
+        self._jobs = OrderedDict()
+        self._recent_waits = deque(maxlen=50)
+        self._lock = threading.Lock()
+
+    def _prune(self) -> None:
+        """Drop finished jobs past the retention period. Caller holds the lock."""
+        cutoff = time.monotonic() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, func: Callable, *args, **kwargs) -> str:
+        """
+        Queue func(*args, progress=..., **kwargs) to run on a worker.
+
+        func receives the job's ProgressReporter as the progress keyword argument, so stage
+        events from the OpenAI client are visible through get.
+
+        Returns:
+            str: Job ID to poll.
+        """
+        with self._lock:
+            self._prune()
+            pending = sum(1 for job in self._jobs.values() if not job.finished)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} jobs are already waiting; try again shortly.")
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job.id
+
+    def _run(self, job: Job, func: Callable, args: tuple, kwargs: dict) -> None:
+        with self._lock:
+            job.started_at = time.monotonic()
+            job.status = RUNNING
+            self._recent_waits.append(job.wait_seconds)
+        # Stage times count from here, not from submit, so they leave out the time spent queued
+        job.progress.started = time.perf_counter()
+        try:
+            result, error, status = func(*args, progress=job.progress, **kwargs), None, DONE
+        except Exception as e:
+            result, error, status = None, e, FAILED
+        # Set finished_at before the status so a finished job always has it
+        job.result, job.error, job.finished_at = result, error, time.monotonic()
+        job.status = status
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        """Return a job by ID, or None if it is unknown or has been forgotten."""
+        if job_id is None:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def forget(self, job_id: str) -> None:
+        """Drop a finished job once its outcome has been collected, releasing its result."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished:
+                del self._jobs[job_id]
+
+    def position(self, job_id: str) -> int:
+        """Number of queued jobs ahead of the given job (0 once it is running)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return 0
+            ahead = 0
+            for other in self._jobs.values():
+                if other is job:
+                    return ahead
+                if other.status == QUEUED:
+                    ahead += 1
+        return ahead
+
+    def stats(self) -> dict:
+        """
+        Report queue depth and recent wait times.
+
+        Returns:
+            dict: Queued and running job counts, worker count and the mean wait of recent jobs.
+        """
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+            waits = list(self._recent_waits)
+        return {
+            "queued": queued,
+            "running": running,
+            "workers": self.max_workers,
+            "mean_wait_seconds": sum(waits) / len(waits) if waits else 0.0,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting jobs and optionally wait for running ones to finish."""
+        self._executor.shutdown(wait=wait)
+
+
+def create_job_queue() -> JobQueue:
+    """Create the background job queue configured in config.settings."""
+    return JobQueue(
+        max_workers=JOB_WORKERS,
+        max_pending=JOB_MAX_PENDING,
+        retention_seconds=JOB_RETENTION_SECONDS
+    )
@@ -0,0 +1,181 @@
+import os
+import sys
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import METRICS_ENABLED
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_NULL_SPAN = nullcontext()
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = labels + ((extra,) if extra else ())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters and latency histograms for the transformation pipeline.
+
+    Stages are timed with span() into the deghiblify_stage_seconds histogram. Values are
+    exported as Prometheus text by render_prometheus(), and every update is also passed
+    to any registered sinks (e.g. a StatsD or logging adapter). When disabled, every
+    method returns immediately and span() hands back a shared no-op context manager.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._counters = {}
+        self._histograms = {}
+        self._sinks = []
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink: Callable[[str, str, float, Dict[str, str]], None]) -> None:
+        """Register a callable receiving (kind, name, value, labels) for every update."""
+        self._sinks.append(sink)
+
+    def _notify(self, kind: str, name: str, value: float, labels: Dict[str, str]) -> None:
+        for sink in self._sinks:
+            sink(kind, name, value, labels)
+
+    def increment(self, name: str, amount: float = 1, **labels) -> None:
+        """Add to a counter."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+        if self._sinks:
+            self._notify("counter", name, amount, labels)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record a value in a histogram."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+        if self._sinks:
+            self._notify("histogram", name, value, labels)
+
+    @contextmanager
+    def _span(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.increment("deghiblify_stage_errors_total", stage=stage)
+            raise
+        finally:
+            self.observe("deghiblify_stage_seconds", time.perf_counter() - started, stage=stage)
+
+    def span(self, stage: str):
+        """Time a pipeline stage, e.g. with metrics.span("vision"): ..."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(stage)
+
+    def timed(self, stage: str):
+        """Decorator timing every call of a function as a pipeline stage."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render_prometheus(self) -> str:
+        """Render every counter and histogram in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (histogram.buckets, list(histogram.counts), histogram.sum, histogram.count))
+                for key, histogram in self._histograms.items()
+            )
+
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), (buckets, counts, total, count) in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', le))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry(enabled=METRICS_ENABLED)
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0", registry: MetricsRegistry = metrics) -> ThreadingHTTPServer:
+    """
+    Serve GET /metrics in Prometheus text format from a background thread.
+
+    Args:
+        port (int): Port to listen on.
+        host (str): Interface to listen on.
+        registry (MetricsRegistry): Registry to export.
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,124 +1,696 @@
 import os
+import sys
+import time
 import base64
-from openai import OpenAI
-from typing import Optional
+import hashlib
+import threading
+import importlib.util
+from collections import OrderedDict
+import httpx
+from openai import OpenAI, DefaultHttpxClient
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.cache import make_cache_key
+from src.metrics import metrics
+from src.image_processor import ImageProcessor, ImageInput, SourceImage, VisionPayload
+from config.settings import (
+    VISION_MAX_SIDE, VISION_SHORT_SIDE, VISION_JPEG_QUALITY, VISION_STREAM, IMAGE_RESPONSE_FORMAT,
+    VISION_CROP_TO_SUBJECT, VISION_CROP_MARGIN, VISION_CROP_MAX_AREA,
+    OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS, SHARED_CLIENT_POOL_SIZE,
+)
+
+# Bump when the vision prompts change so cached descriptions are not reused
+DESCRIPTION_PROMPT_VERSION = "1"
+VISION_MODEL = "gpt-4o"
+VISION_MAX_TOKENS = 700
+VISION_PROMPT_TOKENS = 120  # Rough token count of the system and user prompt text
+VISION_SYSTEM_PROMPT = (
+    "You are an expert in character realism transformation. Convert anime-style characters "
+    "into photorealistic versions while preserving key features like face shape, hairstyle, and expression. "
+    "Avoid anime-related language. The goal is to generate a vivid, realistic human description."
+)
+VISION_USER_PROMPT = (
+    "Describe how this character would look as a real human. Maintain the same gender, age, hairstyle, "
+    "and outfit details. Avoid mentioning anime or cartoon elements."
+)
+
+IMAGE_MODEL = "dall-e-3"
+IMAGE_SIZE = "1024x1024"
+IMAGE_QUALITY = "standard"
+PORTRAIT_PROMPT_TEMPLATE = (
+    "Photorealistic studio portrait of a person: {description}. "
+    "The person should resemble the face, hairstyle, and outfit in the reference, "
+    "but look like a real human. No anime or fantasy styling."
+)
+# DALL·E 3 takes no seed, so variants differ by style and a short lighting/setting hint instead
+VARIANT_HINTS = (
+    None,
+    "Soft natural window light.",
+    "Outdoors at golden hour.",
+    "Candid shot on an overcast day.",
+)
+VARIANT_STYLES = ("vivid", "natural")
+
+
+def build_vision_messages(image_data_url: str) -> list:
+    """
+    Build the chat messages asking GPT-4o for a realistic description of an image.
+
+    Args:
+        image_data_url (str): Image as a base64 data URL.
+    
+    Returns:
+        list: Messages for chat.completions.create.
+    """
+    return [
+        {
+            "role": "system",
+            "content": VISION_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": VISION_USER_PROMPT
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": image_data_url
+                    }
+                }
+            ]
+        }
+    ]
+
+
+def record_usage(model: str, usage) -> None:
+    """Count the prompt and completion tokens reported in a response's usage, if any."""
+    if usage is not None:
+        metrics.increment("deghiblify_tokens_total", usage.prompt_tokens, model=model, kind="prompt")
+        metrics.increment("deghiblify_tokens_total", usage.completion_tokens, model=model, kind="completion")
+
+
+def build_portrait_prompt(description: str, hint: Optional[str] = None) -> str:
+    """
+    Build the DALL·E prompt for a realistic portrait from a description.
+
+    Args:
+        description (str): Humanized character description.
+        hint (Optional[str]): Extra direction appended for a variant, e.g. a lighting change.
+    
+    Returns:
+        str: Image generation prompt.
+    """
+    prompt = PORTRAIT_PROMPT_TEMPLATE.format(description=description)
+    return f"{prompt} {hint}" if hint else prompt
+
+
+def default_variants(count: int) -> List[dict]:
+    """
+    Build generation parameters for count portrait variants.
+
+    Args:
+        count (int): Number of variants.
+    
+    Returns:
+        List[dict]: Keyword arguments for generate_from_description (style and hint), one per variant.
+    """
+    return [
+        {"style": VARIANT_STYLES[i % len(VARIANT_STYLES)], "hint": VARIANT_HINTS[i % len(VARIANT_HINTS)]}
+        for i in range(count)
+    ]
 
-class OpenAIClient:
-    """Client for interacting with OpenAI APIs."""
 
-    def __init__(self, api_key: Optional[str] = None):
+class ProgressReporter:
+    """
+    Forwards pipeline stage events to a progress callback.
+
+    The callback is called as callback(stage, elapsed_seconds) with one of the stages
+    "encoded", "describing" (first streamed description text arrived), "described",
+    "generated", "downloaded" (URL responses only), "cached" (result served from cache)
+    or "variant" (one of generate_variants' portraits finished).
+    """
+
+    def __init__(self, callback: Optional[Callable[[str, float], None]] = None):
+        self.callback = callback
+        self.started = time.perf_counter()
+        self.timings = {}
+        # Set once the image has been encoded for the vision call, and once it has been described
+        self.vision_payload = None
+        self.description = None
+        # Description text received so far while it streams in
+        self.partial_description = ""
+        # Finished generate_variants results by variant index: image bytes or the exception raised
+        self.variants = {}
+
+    @classmethod
+    def wrap(cls, progress) -> "ProgressReporter":
+        """Return progress unchanged if it is already a reporter, so nested calls share one start time."""
+        return progress if isinstance(progress, cls) else cls(progress)
+
+    def __call__(self, stage: str) -> None:
+        elapsed = time.perf_counter() - self.started
+        self.timings[stage] = elapsed
+        if self.callback is not None:
+            self.callback(stage, elapsed)
+
+
+class BaseOpenAIClient:
+    """Caching and preprocessing shared by the sync and async OpenAI clients."""
+
+    # Stream the vision response so partial descriptions reach progress callbacks
+    stream_descriptions = VISION_STREAM
+
+    def __init__(self, api_key: Optional[str] = None, cache=None, description_cache=None,
+                 near_duplicate_index=None, image_response_format: str = IMAGE_RESPONSE_FORMAT):
         """
-        Initialize the OpenAI client with provided API key or from environment.
+        Initialize the client with provided API key or from environment.
 
         Args:
             api_key (Optional[str]): OpenAI API key. If not provided, it is read from the environment variable 'OPENAI_API_KEY'.
+            cache: Optional result cache (see src.cache) mapping input digests to generated image bytes.
+            description_cache: Optional cache mapping input digests to GPT-4o descriptions.
+            near_duplicate_index: Optional PerceptualHashIndex used to serve re-saved or resized
+                uploads from the result cache.
+            image_response_format (str): "b64_json" to receive generated images inline, or "url"
+                to download them in a separate request.
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("No API key provided and OPENAI_API_KEY environment variable not set.")
         
-        self.client = OpenAI(api_key=self.api_key)
+        self.cache = cache
+        self.description_cache = description_cache
+        self.near_duplicate_index = near_duplicate_index
+        self.image_response_format = image_response_format
 
-    def _encode_image_to_base64(self, image_path: str) -> str:
+    def _prepare_vision_payload(self, source: SourceImage) -> VisionPayload:
         """
-        Encode an image file to base64 string.
+        Downscale and re-encode an image for the vision model.
 
         Args:
-            image_path (str): Path to the image file.
+            source (SourceImage): Input image.
         
         Returns:
-            str: Base64-encoded string of the image.
+            VisionPayload: Encoded image with its MIME type and the bytes/tokens saved.
         """
-        with open(image_path, "rb") as f:
-            return base64.b64encode(f.read()).decode("utf-8")
+        return ImageProcessor.prepare_vision_payload(source.image, original_bytes=len(source), original_size=source.size)
 
-    def _get_realistic_description_from_gpt4o(self, base64_image: str) -> str:
+    def _description_cache_key(self, source: SourceImage) -> str:
+        """
+        Build the description cache key for an input image and the current vision prompt version.
+
+        Args:
+            source (SourceImage): Input image.
+        
+        Returns:
+            str: Cache key for the description.
+        """
+        return make_cache_key(
+            source.data,
+            prompt_version=DESCRIPTION_PROMPT_VERSION,
+            vision_model=VISION_MODEL,
+            vision_max_tokens=VISION_MAX_TOKENS,
+            vision_max_side=VISION_MAX_SIDE,
+            vision_short_side=VISION_SHORT_SIDE,
+            vision_jpeg_quality=VISION_JPEG_QUALITY,
+            vision_crop=(VISION_CROP_TO_SUBJECT, VISION_CROP_MARGIN, VISION_CROP_MAX_AREA),
+        )
+
+    def _result_cache_key(self, source: SourceImage) -> str:
+        """
+        Build the result cache key for an input image and the current prompt/model parameters.
+
+        Args:
+            source (SourceImage): Input image.
+        
+        Returns:
+            str: Cache key for the generated image.
+        """
+        return make_cache_key(
+            source.data,
+            prompt_version=DESCRIPTION_PROMPT_VERSION,
+            vision_model=VISION_MODEL,
+            vision_max_tokens=VISION_MAX_TOKENS,
+            vision_max_side=VISION_MAX_SIDE,
+            vision_short_side=VISION_SHORT_SIDE,
+            vision_jpeg_quality=VISION_JPEG_QUALITY,
+            vision_crop=(VISION_CROP_TO_SUBJECT, VISION_CROP_MARGIN, VISION_CROP_MAX_AREA),
+            image_model=IMAGE_MODEL,
+            image_size=IMAGE_SIZE,
+            image_quality=IMAGE_QUALITY,
+            portrait_prompt=PORTRAIT_PROMPT_TEMPLATE,
+        )
+
+    def _lookup_description(self, source: SourceImage) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Look up a cached description for an input image.
+
+        Args:
+            source (SourceImage): Input image.
+        
+        Returns:
+            Tuple[Optional[str], Optional[str]]: The cached description (or None) and the key to store a new one under.
+        """
+        if self.description_cache is None:
+            return None, None
+        cache_key = self._description_cache_key(source)
+        cached = self.description_cache.get(cache_key)
+        metrics.increment("deghiblify_cache_lookups_total", cache="description", result="miss" if cached is None else "hit")
+        return (cached.decode("utf-8") if cached is not None else None), cache_key
+
+    def _store_description(self, cache_key: Optional[str], description: str) -> None:
+        """Store a description under the key returned by _lookup_description."""
+        if cache_key is not None:
+            self.description_cache.set(cache_key, description.encode("utf-8"))
+
+    def _lookup_result(self, source: SourceImage) -> Tuple[Optional[bytes], Optional[str], Optional[int]]:
+        """
+        Look up a cached result for an input image, falling back to near-duplicate uploads.
+
+        Args:
+            source (SourceImage): Input image.
+        
+        Returns:
+            Tuple[Optional[bytes], Optional[str], Optional[int]]: The cached image bytes (or None),
+                and the cache key and perceptual hash to store a new result under.
+        """
+        if self.cache is None:
+            return None, None, None
+
+        cache_key = self._result_cache_key(source)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            metrics.increment("deghiblify_cache_lookups_total", cache="result", result="hit")
+            return cached, cache_key, None
+
+        image_hash = None
+        if self.near_duplicate_index is not None:
+            image_hash = ImageProcessor.perceptual_hash(source.image)
+            while cached is None:
+                match = self.near_duplicate_index.find(image_hash)
+                if match is None:
+                    break
+                matched_hash, matched_key, _ = match
+                cached = self.cache.get(matched_key)
+                if cached is None:
+                    # The result expired or was evicted; drop it so it cannot hide a further match
+                    self.near_duplicate_index.remove(matched_hash)
+        metrics.increment("deghiblify_cache_lookups_total", cache="result",
+                          result="miss" if cached is None else "near_duplicate")
+        return cached, cache_key, image_hash
+
+    def _store_result(self, cache_key: Optional[str], image_hash: Optional[int], generated_image: bytes) -> None:
+        """Store a generated image under the key and hash returned by _lookup_result."""
+        if cache_key is not None:
+            self.cache.set(cache_key, generated_image)
+            if image_hash is not None:
+                self.near_duplicate_index.add(image_hash, cache_key)
+
+
+class OpenAIClient(BaseOpenAIClient):
+    """Client for interacting with OpenAI APIs."""
+
+    def __init__(self, api_key: Optional[str] = None, cache=None, description_cache=None,
+                 near_duplicate_index=None, rate_limiter=None, image_response_format: str = IMAGE_RESPONSE_FORMAT,
+                 http_client: Optional[httpx.Client] = None, base_url: Optional[str] = None):
+        """
+        Initialize the OpenAI client with provided API key or from environment.
+
+        Args:
+            api_key (Optional[str]): OpenAI API key. If not provided, it is read from the environment variable 'OPENAI_API_KEY'.
+            cache: Optional result cache (see src.cache) mapping input digests to generated image bytes.
+            description_cache: Optional cache mapping input digests to GPT-4o descriptions.
+            near_duplicate_index: Optional PerceptualHashIndex used to serve re-saved or resized
+                uploads from the result cache.
+            rate_limiter: Optional RateLimiter (see src.rate_limiter) applied to every API call.
+                It takes over retries, so the OpenAI library's own retries are disabled.
+            image_response_format (str): "b64_json" to receive generated images inline, or "url"
+                to download them in a separate request.
+            http_client (Optional[httpx.Client]): HTTP client for the OpenAI SDK, e.g. a pooled
+                one from create_http_client().
+            base_url (Optional[str]): OpenAI API base URL, e.g. a local mock server. Defaults to
+                the OPENAI_BASE_URL environment variable or the public API.
+        """
+        super().__init__(api_key, cache, description_cache, near_duplicate_index, image_response_format)
+        self.rate_limiter = rate_limiter
+        client_options = {"http_client": http_client, "base_url": base_url}
+        if rate_limiter is not None:
+            client_options["max_retries"] = 0
+        self.client = OpenAI(api_key=self.api_key, **client_options)
+
+    def _call_api(self, model: str, func, tokens: int = 0, images: int = 0):
+        """Run an API call through the rate limiter, if one is configured."""
+        if self.rate_limiter is None:
+            return func()
+        return self.rate_limiter.call(model, func, tokens=tokens, images=images)
+
+    def _get_realistic_description_from_gpt4o(self, image_data_url: str, image_tokens: int = 0) -> str:
         """
         Use GPT-4o to generate a realistic description of the anime character.
 
         Args:
-            base64_image (str): Base64-encoded image string.
+            image_data_url (str): Image as a base64 data URL.
+            image_tokens (int): Estimated input tokens for the image, used for tokens/minute limiting.
         
         Returns:
             str: Realistic character description.
         """
-        response = self.client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an expert in character realism transformation. Convert anime-style characters "
-                        "into photorealistic versions while preserving key features like face shape, hairstyle, and expression. "
-                        "Avoid anime-related language. The goal is to generate a vivid, realistic human description."
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": (
-                                "Describe how this character would look as a real human. Maintain the same gender, age, hairstyle, "
-                                "and outfit details. Avoid mentioning anime or cartoon elements."
-                            )
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=700
-        )
+        with metrics.span("vision"):
+            response = self._call_api(
+                VISION_MODEL,
+                lambda: self.client.chat.completions.create(
+                    model=VISION_MODEL,
+                    messages=build_vision_messages(image_data_url),
+                    max_tokens=VISION_MAX_TOKENS
+                ),
+                # Quota is reserved for max_tokens up front, so count it in full
+                tokens=image_tokens + VISION_PROMPT_TOKENS + VISION_MAX_TOKENS
+            )
+        record_usage(VISION_MODEL, response.usage)
         return response.choices[0].message.content.strip()
 
-    def _generate_dalle_image(self, description: str) -> str:
+    def _stream_realistic_description(self, image_data_url: str, image_tokens: int = 0) -> Iterator[str]:
+        """
+        Stream GPT-4o's realistic description of the anime character as it is generated.
+
+        Args:
+            image_data_url (str): Image as a base64 data URL.
+            image_tokens (int): Estimated input tokens for the image, used for tokens/minute limiting.
+        
+        Yields:
+            str: Description text fragments, in order.
+        """
+        with metrics.span("vision"):
+            stream = self._call_api(
+                VISION_MODEL,
+                lambda: self.client.chat.completions.create(
+                    model=VISION_MODEL,
+                    messages=build_vision_messages(image_data_url),
+                    max_tokens=VISION_MAX_TOKENS,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                ),
+                tokens=image_tokens + VISION_PROMPT_TOKENS + VISION_MAX_TOKENS
+            )
+            with stream:
+                for chunk in stream:
+                    # The final chunk carries usage and no choices
+                    if chunk.usage is not None:
+                        record_usage(VISION_MODEL, chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+
+    def _generate_dalle_image(self, description: str, style: Optional[str] = None, size: str = IMAGE_SIZE,
+                              hint: Optional[str] = None):
         """
         Use DALL·E 3 to generate a photorealistic image based on description.
 
         Args:
             description (str): Humanized character description.
+            style (Optional[str]): DALL·E 3 style, "vivid" or "natural"; the API default if None.
+            size (str): Image size, e.g. "1024x1024" or "1024x1792".
+            hint (Optional[str]): Extra prompt direction for a variant.
         
         Returns:
-            str: URL of the generated image.
+            Image: Generated image entry, holding b64_json or url depending on image_response_format.
         """
-        prompt = (
-            f"Photorealistic studio portrait of a person: {description}. "
-            "The person should resemble the face, hairstyle, and outfit in the reference, "
-            "but look like a real human. No anime or fantasy styling."
-        )
+        options = {"style": style} if style else {}
+        with metrics.span("generate"):
+            response = self._call_api(
+                IMAGE_MODEL,
+                lambda: self.client.images.generate(
+                    model=IMAGE_MODEL,
+                    prompt=build_portrait_prompt(description, hint),
+                    size=size,
+                    quality=IMAGE_QUALITY,
+                    response_format=self.image_response_format,
+                    n=1,
+                    **options
+                ),
+                images=1
+            )
+        return response.data[0]
 
-        response = self.client.images.generate(
-            model="dall-e-3",
-            prompt=prompt,
-            size="1024x1024",
-            quality="standard",
-            n=1
-        )
-        return response.data[0].url
+    def _describe_stream(self, source: SourceImage, progress: Optional[ProgressReporter] = None) -> Iterator[str]:
+        """
+        Produce the realistic description for an input image as it arrives, consulting the description cache.
+
+        A cached description is yielded in one piece. Otherwise the text is streamed when
+        stream_descriptions is set, and the complete description is cached once the stream ends.
+
+        Args:
+            source (SourceImage): Input image.
+            progress (Optional[ProgressReporter]): Receives the "encoded", "describing" and "described"
+                stage events; progress.partial_description grows as text arrives.
+        
+        Yields:
+            str: Description text fragments, in order.
+        """
+        progress = ProgressReporter.wrap(progress)
+        description, cache_key = self._lookup_description(source)
+        if description is not None:
+            progress.partial_description = progress.description = description
+            progress("described")
+            yield description
+            return
+
+        payload = self._prepare_vision_payload(source)
+        progress.vision_payload = payload
+        progress("encoded")
+        if self.stream_descriptions:
+            for text in self._stream_realistic_description(payload.data_url, payload.tokens):
+                if not progress.partial_description:
+                    progress("describing")
+                progress.partial_description += text
+                yield text
+            description = progress.partial_description.strip()
+        else:
+            description = self._get_realistic_description_from_gpt4o(payload.data_url, payload.tokens)
+            progress.partial_description = description
+            yield description
+        progress.description = description
+        progress("described")
+        self._store_description(cache_key, description)
+
+    def _describe(self, source: SourceImage, progress: Optional[ProgressReporter] = None) -> str:
+        """
+        Get the realistic description for an input image, consulting the description cache.
+
+        Args:
+            source (SourceImage): Input image.
+            progress (Optional[ProgressReporter]): Receives the "encoded", "describing" and "described" stage events.
+        
+        Returns:
+            str: Realistic character description.
+        """
+        progress = ProgressReporter.wrap(progress)
+        for _ in self._describe_stream(source, progress):
+            pass
+        return progress.description
+
+    def describe_image_stream(self, image: ImageInput,
+                              progress: Optional[Callable[[str, float], None]] = None) -> Iterator[str]:
+        """
+        Describe how the character in an image would look as a real human, yielding the text as it arrives.
+
+        The complete description is cached as with describe_image, so a following
+        generate_from_description call can start the moment the stream ends.
+
+        Args:
+            image (ImageInput): Input image as a file path, encoded bytes, binary file object
+                (e.g. a Streamlit upload), PIL Image or SourceImage.
+            progress (Optional[Callable[[str, float], None]]): Called with each stage reached and the seconds elapsed.
+        
+        Yields:
+            str: Description text fragments, in order.
+        """
+        return self._describe_stream(SourceImage.from_any(image), ProgressReporter.wrap(progress))
+
+    def describe_image(self, image: ImageInput, progress: Optional[Callable[[str, float], None]] = None) -> str:
+        """
+        Describe how the character in an image would look as a real human.
+
+        Descriptions are cached by a digest of the input file and the vision prompt
+        version, so they can be reused to generate several portraits.
+
+        Args:
+            image (ImageInput): Input image as a file path, encoded bytes, binary file object
+                (e.g. a Streamlit upload), PIL Image or SourceImage.
+            progress (Optional[Callable[[str, float], None]]): Called with each stage reached and the seconds elapsed.
+        
+        Returns:
+            str: Realistic character description.
+        """
+        progress = ProgressReporter.wrap(progress)
+        return self._describe(SourceImage.from_any(image), progress)
 
-    def deghiblify_image(self, image_path: str) -> str:
+    def generate_from_description(self, description: str,
+                                  progress: Optional[Callable[[str, float], None]] = None,
+                                  style: Optional[str] = None, size: str = IMAGE_SIZE, hint: Optional[str] = None) -> bytes:
+        """
+        Generate a new realistic portrait from an existing description.
+
+        Each call produces a fresh take; the result cache is not consulted.
+
+        Args:
+            description (str): Realistic character description, e.g. from describe_image.
+            progress (Optional[Callable[[str, float], None]]): Called with each stage reached and the seconds elapsed.
+            style (Optional[str]): DALL·E 3 style, "vivid" or "natural"; the API default if None.
+            size (str): Image size, e.g. "1024x1024" or "1024x1792".
+            hint (Optional[str]): Extra prompt direction, e.g. a lighting change.
+        
+        Returns:
+            bytes: Encoded bytes of the generated realistic portrait.
+        """
+        progress = ProgressReporter.wrap(progress)
+        generated = self._generate_dalle_image(description, style=style, size=size, hint=hint)
+        progress("generated")
+        if generated.b64_json is not None:
+            metrics.increment("deghiblify_bytes_total", len(generated.b64_json), direction="download")
+            return base64.b64decode(generated.b64_json)
+        
+        generated_image = ImageProcessor.download_image_bytes(generated.url)
+        progress("downloaded")
+        return generated_image
+
+    def deghiblify_image(self, image: ImageInput, progress: Optional[Callable[[str, float], None]] = None) -> bytes:
         """
         Transform a Ghibli-style anime character image into a realistic human version.
 
+        The generated image bytes are cached by a digest of the input file and the
+        prompt/model parameters, so repeated uploads of the same image skip both API calls.
+        With a near-duplicate index, uploads that are perceptually close to a previous one
+        are served from that upload's cached result.
+
+        The input is decoded at most once and never written to disk; the cache key, the
+        perceptual hash and the vision payload all work from the same in-memory image.
+
         Args:
-            image_path (str): Path to the input image.
+            image (ImageInput): Input image as a file path, encoded bytes, binary file object
+                (e.g. a Streamlit upload), PIL Image or SourceImage.
+            progress (Optional[Callable[[str, float], None]]): Called with each stage reached
+                ("encoded", "described", "generated", "downloaded" for URL responses, or "cached")
+                and the seconds elapsed.
         
         Returns:
-            str: URL to the generated realistic portrait.
+            bytes: Encoded bytes of the generated realistic portrait.
         """
-        base64_image = self._encode_image_to_base64(image_path)
-        description = self._get_realistic_description_from_gpt4o(base64_image)
-        generated_image_url = self._generate_dalle_image(description)
-        return generated_image_url
+        progress = ProgressReporter.wrap(progress)
+        source = SourceImage.from_any(image)
+
+        cached, cache_key, image_hash = self._lookup_result(source)
+        if cached is not None:
+            progress("cached")
+            return cached
+
+        description = self._describe(source, progress)
+        generated_image = self.generate_from_description(description, progress)
+        self._store_result(cache_key, image_hash, generated_image)
+        return generated_image
+
+    def generate_variants(self, image: ImageInput, count: int = 4, variants: Optional[List[dict]] = None,
+                          progress: Optional[Callable[[str, float], None]] = None
+                          ) -> Iterator[Tuple[int, Union[bytes, BaseException]]]:
+        """
+        Describe an image once, then generate several portraits from the description concurrently.
+
+        Variants are yielded as soon as each finishes, so wall time is close to that of the
+        slowest single generation rather than the sum. The result cache is not consulted.
+
+        Args:
+            image (ImageInput): Input image as a file path, encoded bytes, binary file object,
+                PIL Image or SourceImage.
+            count (int): Number of variants when variants is not given.
+            variants (Optional[List[dict]]): Per-variant generate_from_description arguments
+                (style, size, hint); defaults to default_variants(count).
+            progress (Optional[Callable[[str, float], None]]): Called with "encoded" and "described",
+                then "variant" as each portrait finishes; finished variants are in progress.variants.
+        
+        Yields:
+            Tuple[int, Union[bytes, BaseException]]: Variant index and its image bytes, or the exception raised.
+        """
+        progress = ProgressReporter.wrap(progress)
+        variants = variants if variants is not None else default_variants(count)
+        description = self._describe(SourceImage.from_any(image), progress)
+
+        with ThreadPoolExecutor(max_workers=max(1, len(variants)), thread_name_prefix="deghiblify-variant") as pool:
+            futures = {
+                pool.submit(self.generate_from_description, description, **variant): index
+                for index, variant in enumerate(variants)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                progress.variants[index] = result
+                progress("variant")
+                yield index, result
+
+
+_shared_clients = OrderedDict()
+_shared_clients_lock = threading.Lock()
+
+
+def create_http_client() -> httpx.Client:
+    """
+    Create an HTTP client for the OpenAI SDK with a bounded keep-alive connection pool.
+
+    HTTP/2 is enabled when the optional h2 package is installed.
+
+    Returns:
+        httpx.Client: Pooled HTTP client.
+    """
+    return DefaultHttpxClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS
+        )
+    )
+
+
+def get_shared_client(api_key: Optional[str] = None, **options) -> OpenAIClient:
+    """
+    Return a process-wide OpenAIClient for an API key, creating it on first use.
+
+    Reusing one client per key keeps its TLS connections warm across requests and
+    Streamlit reruns. The least recently used client is dropped from the pool once
+    more than SHARED_CLIENT_POOL_SIZE keys are in use. It is not closed, since sessions
+    and queued jobs may still hold it; its connections go when it is garbage collected.
+
+    Args:
+        api_key (Optional[str]): OpenAI API key. If not provided, it is read from the environment variable 'OPENAI_API_KEY'.
+        **options: Other OpenAIClient arguments, only applied when the client is first created.
+    
+    Returns:
+        OpenAIClient: Shared client for the key.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY") or ""
+    pool_key = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+    with _shared_clients_lock:
+        client = _shared_clients.get(pool_key)
+        if client is None:
+            client = OpenAIClient(api_key=api_key or None, http_client=create_http_client(), **options)
+            _shared_clients[pool_key] = client
+            while len(_shared_clients) > SHARED_CLIENT_POOL_SIZE:
+                _shared_clients.popitem(last=False)
+        else:
+            _shared_clients.move_to_end(pool_key)
+    return client
 
 
 # Example usage:
 # if __name__ == "__main__":
 #     client = OpenAIClient(api_key="your-api-key-here")  # or set OPENAI_API_KEY in environment
-#     output_url = client.deghiblify_image("image.png")   # Replace with your image path
-#     print("✅ Generated Image URL:", output_url)
+#     output = client.deghiblify_image("image.png")       # Replace with your image path
+#     with open("output.png", "wb") as f:
+#         f.write(output)
+#     print("✅ Generated image saved to output.png")
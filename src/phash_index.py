@@ -0,0 +1,221 @@
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import NEAR_DUPLICATE_MAX_DISTANCE, NEAR_DUPLICATE_MAX_ENTRIES, NEAR_DUPLICATE_INDEX_PATH
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Return the number of differing bits between two integer hashes."""
+    return bin(a ^ b).count("1")
+
+
+class PerceptualHashIndex:
+    """
+    Near-duplicate lookup over perceptual hashes using multi-index hashing.
+
+    Each hash is split into max_distance + 1 disjoint bit chunks, and every chunk is
+    indexed in its own table. Two hashes within max_distance bits of each other must
+    agree exactly on at least one chunk, so a lookup only has to verify the entries that
+    share a chunk with the query instead of scanning the whole index.
+
+    With max_entries set, the least recently added or matched hashes are dropped beyond
+    that many. With a path, additions and removals are appended to a log file that is
+    replayed (and compacted) when the index is created, so it survives restarts.
+    """
+
+    def __init__(self, max_distance: int = 4, hash_bits: int = 64, max_entries: Optional[int] = None,
+                 path: Optional[str] = None):
+        """
+        Initialize the index.
+
+        Args:
+            max_distance (int): Largest hamming distance that lookups can be asked for.
+            hash_bits (int): Number of bits in each hash (64 for an 8x8 dHash).
+            max_entries (Optional[int]): Most hashes kept; None leaves the index unbounded.
+            path (Optional[str]): Log file persisting the index; values must then be strings without newlines.
+        """
+        if not 0 <= max_distance < hash_bits:
+            raise ValueError("max_distance must be between 0 and hash_bits - 1.")
+
+        self.max_distance = max_distance
+        self.hash_bits = hash_bits
+        self.max_entries = max_entries
+        self.path = path
+
+        chunk_count = max_distance + 1
+        self._chunks = []
+        shift = 0
+        for i in range(chunk_count):
+            width = hash_bits // chunk_count + (1 if i < hash_bits % chunk_count else 0)
+            self._chunks.append((shift, (1 << width) - 1))
+            shift += width
+
+        self._tables = [{} for _ in self._chunks]
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+        self._log_lines = 0
+        if path is not None:
+            self._load()
+
+    def _insert(self, hash_value: int, value: Any) -> None:
+        """Add or replace an entry and drop the oldest ones over max_entries. Caller holds the lock."""
+        if hash_value in self._values:
+            self._values.move_to_end(hash_value)
+        else:
+            for table, (shift, mask) in zip(self._tables, self._chunks):
+                table.setdefault((hash_value >> shift) & mask, []).append(hash_value)
+        self._values[hash_value] = value
+        while self.max_entries is not None and len(self._values) > self.max_entries:
+            self._delete(next(iter(self._values)))
+
+    def _delete(self, hash_value: int) -> bool:
+        """Remove an entry from the tables. Caller holds the lock."""
+        if self._values.pop(hash_value, None) is None:
+            return False
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            chunk = (hash_value >> shift) & mask
+            bucket = table[chunk]
+            bucket.remove(hash_value)
+            if not bucket:
+                del table[chunk]
+        return True
+
+    def _load(self) -> None:
+        """Replay the log file, then rewrite it with only the live entries."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    hash_hex, _, value = line.rstrip("\n").partition(" ")
+                    try:
+                        hash_value = int(hash_hex, 16)
+                    except ValueError:
+                        # e.g. a line cut short by a crash
+                        continue
+                    if value:
+                        self._insert(hash_value, value)
+                    else:
+                        self._delete(hash_value)
+        except FileNotFoundError:
+            pass
+        self._compact()
+
+    def _compact(self) -> None:
+        """Atomically rewrite the log file with one line per live entry. Caller holds the lock."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for hash_value, value in self._values.items():
+                    f.write(f"{hash_value:x} {value}\n")
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        self._log_lines = len(self._values)
+
+    def _log(self, line: str) -> None:
+        """Append a record to the log file, compacting it once most records are obsolete. Caller holds the lock."""
+        if self.path is None:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        self._log_lines += 1
+        if self._log_lines > 2 * len(self._values) + 1024:
+            self._compact()
+
+    def add(self, hash_value: int, value: Any) -> None:
+        """
+        Add a hash to the index, replacing the value stored for an identical hash.
+
+        Args:
+            hash_value (int): Perceptual hash of the image.
+            value: Payload returned by lookup, e.g. a result cache key.
+        """
+        with self._lock:
+            self._insert(hash_value, value)
+            self._log(f"{hash_value:x} {value}")
+
+    def remove(self, hash_value: int) -> None:
+        """
+        Remove a hash from the index, e.g. once the result it points to has left the cache.
+
+        Args:
+            hash_value (int): Hash as passed to add (or returned by find).
+        """
+        with self._lock:
+            if self._delete(hash_value):
+                self._log(f"{hash_value:x}")
+
+    def find(self, hash_value: int, max_distance: Optional[int] = None) -> Optional[Tuple[int, Any, int]]:
+        """
+        Find the closest indexed hash within a distance threshold.
+
+        Args:
+            hash_value (int): Perceptual hash of the query image.
+            max_distance (Optional[int]): Threshold for this query; defaults to the index's max_distance.
+
+        Returns:
+            Optional[Tuple[int, Any, int]]: The matching hash, its stored value and its distance,
+                or None if nothing is close enough.
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+        elif max_distance > self.max_distance:
+            raise ValueError(f"max_distance cannot exceed the index limit of {self.max_distance}.")
+
+        with self._lock:
+            if hash_value in self._values:
+                best, best_distance = hash_value, 0
+            else:
+                best = None
+                best_distance = max_distance + 1
+                seen = set()
+                for table, (shift, mask) in zip(self._tables, self._chunks):
+                    for candidate in table.get((hash_value >> shift) & mask, ()):
+                        if candidate in seen:
+                            continue
+                        seen.add(candidate)
+                        distance = hamming_distance(hash_value, candidate)
+                        if distance < best_distance:
+                            best, best_distance = candidate, distance
+
+            if best is None:
+                return None
+            self._values.move_to_end(best)
+            return best, self._values[best], best_distance
+
+    def lookup(self, hash_value: int, max_distance: Optional[int] = None) -> Optional[Tuple[Any, int]]:
+        """
+        Find the value stored for the closest indexed hash within a distance threshold.
+
+        Args:
+            hash_value (int): Perceptual hash of the query image.
+            max_distance (Optional[int]): Threshold for this query; defaults to the index's max_distance.
+
+        Returns:
+            Optional[Tuple[Any, int]]: The stored value and its distance, or None if nothing is close enough.
+        """
+        match = self.find(hash_value, max_distance)
+        if match is None:
+            return None
+        return match[1], match[2]
+
+    def __len__(self):
+        return len(self._values)
+
+
+def create_near_duplicate_index() -> PerceptualHashIndex:
+    """Create the near-duplicate index configured in config.settings, loading it from its log file."""
+    return PerceptualHashIndex(
+        max_distance=NEAR_DUPLICATE_MAX_DISTANCE,
+        max_entries=NEAR_DUPLICATE_MAX_ENTRIES,
+        path=NEAR_DUPLICATE_INDEX_PATH
+    )
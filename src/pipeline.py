@@ -0,0 +1,197 @@
+import os
+import sys
+import time
+import queue
+import threading
+from typing import Iterator, List
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.image_processor import SourceImage
+
+_DONE = object()
+
+
+class PipelineResult:
+    """Outcome of one image run through the pipeline."""
+
+    def __init__(self, input_path, output=None, error=None, description=None, latency=0.0, cached=False):
+        self.input_path = input_path
+        self.output = output
+        self.error = error
+        self.description = description
+        self.latency = latency
+        self.cached = cached
+
+
+class StageStats:
+    """Busy time and throughput counters for one pipeline stage."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def start(self) -> float:
+        with self._lock:
+            self.active += 1
+        return time.perf_counter()
+
+    def finish(self, started: float) -> None:
+        with self._lock:
+            self.active -= 1
+            self.items += 1
+            self.busy_seconds += time.perf_counter() - started
+
+    def utilization(self, elapsed: float) -> float:
+        """Fraction of the stage's worker time spent busy over elapsed seconds."""
+        if elapsed <= 0:
+            return 0.0
+        return min(1.0, self.busy_seconds / (self.workers * elapsed))
+
+
+class PipelineExecutor:
+    """
+    Run the describe (GPT-4o) and generate (DALL·E) stages in separately sized worker pools.
+
+    Describe workers push descriptions into a bounded queue that generate workers drain, so
+    the vision stage runs ahead of the slow image stage and keeps it saturated, while the
+    queue bound stops descriptions from piling up faster than they can be used.
+    """
+
+    def __init__(self, client, describe_workers: int = 4, generate_workers: int = 2, queue_size: int = 8):
+        """
+        Initialize the executor.
+
+        Args:
+            client (OpenAIClient): Client used for both stages; its caches are honoured.
+            describe_workers (int): Number of concurrent vision calls.
+            generate_workers (int): Number of concurrent image generations.
+            queue_size (int): Maximum number of descriptions waiting for a generator.
+        """
+        # With no workers in a stage, run() would wait forever for results that never come
+        if describe_workers < 1 or generate_workers < 1:
+            raise ValueError("describe_workers and generate_workers must be at least 1.")
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1.")
+
+        self.client = client
+        self.describe_workers = describe_workers
+        self.generate_workers = generate_workers
+        self.queue_size = queue_size
+        self.describe_stats = StageStats("describe", describe_workers)
+        self.generate_stats = StageStats("generate", generate_workers)
+        self._descriptions = queue.Queue(maxsize=queue_size)
+        self._started_at = None
+
+    def stats(self) -> dict:
+        """
+        Report queue depth and per-stage utilization for tuning the pool sizes.
+
+        Returns:
+            dict: Queue depth plus items, active workers and utilization for each stage.
+        """
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+        report = {"queue_depth": self._descriptions.qsize(), "queue_size": self.queue_size, "elapsed": elapsed}
+        for stage in (self.describe_stats, self.generate_stats):
+            report[stage.name] = {
+                "workers": stage.workers,
+                "active": stage.active,
+                "items": stage.items,
+                "utilization": stage.utilization(elapsed),
+            }
+        return report
+
+    def _describe_worker(self, inputs: Iterator[str], inputs_lock: threading.Lock, results: queue.Queue) -> None:
+        while True:
+            with inputs_lock:
+                input_path = next(inputs, None)
+            if input_path is None:
+                return
+
+            submitted = time.perf_counter()
+            started = self.describe_stats.start()
+            try:
+                source = SourceImage.from_any(input_path)
+                cached, cache_key, image_hash = self.client._lookup_result(source)
+                if cached is not None:
+                    results.put(PipelineResult(input_path, output=cached, latency=time.perf_counter() - submitted,
+                                               cached=True))
+                    continue
+                description = self.client._describe(source)
+            except Exception as e:
+                results.put(PipelineResult(input_path, error=e, latency=time.perf_counter() - submitted))
+                continue
+            finally:
+                self.describe_stats.finish(started)
+
+            # Blocks while the generators are behind, applying backpressure to the vision stage
+            self._descriptions.put((input_path, description, cache_key, image_hash, submitted))
+
+    def _generate_worker(self, results: queue.Queue) -> None:
+        while True:
+            item = self._descriptions.get()
+            if item is _DONE:
+                return
+
+            input_path, description, cache_key, image_hash, submitted = item
+            started = self.generate_stats.start()
+            try:
+                generated_image = self.client.generate_from_description(description)
+                self.client._store_result(cache_key, image_hash, generated_image)
+                results.put(PipelineResult(input_path, output=generated_image, description=description,
+                                           latency=time.perf_counter() - submitted))
+            except Exception as e:
+                results.put(PipelineResult(input_path, error=e, description=description,
+                                           latency=time.perf_counter() - submitted))
+            finally:
+                self.generate_stats.finish(started)
+
+    def run(self, image_paths: List[str]) -> Iterator[PipelineResult]:
+        """
+        Process images through both stages, yielding results as they complete.
+
+        Args:
+            image_paths (List[str]): Paths to the input images.
+
+        Yields:
+            PipelineResult: One result per input, in completion order.
+        """
+        self._started_at = time.perf_counter()
+        results = queue.Queue()
+        inputs = iter(image_paths)
+        inputs_lock = threading.Lock()
+
+        describers = [
+            threading.Thread(target=self._describe_worker, args=(inputs, inputs_lock, results), daemon=True)
+            for _ in range(self.describe_workers)
+        ]
+        generators = [
+            threading.Thread(target=self._generate_worker, args=(results,), daemon=True)
+            for _ in range(self.generate_workers)
+        ]
+        for thread in describers + generators:
+            thread.start()
+
+        def close_generators():
+            for thread in describers:
+                thread.join()
+            for _ in generators:
+                self._descriptions.put(_DONE)
+
+        threading.Thread(target=close_generators, daemon=True).start()
+
+        for _ in range(len(image_paths)):
+            yield results.get()
+
+    def summary(self) -> str:
+        """Format the current stats as a one-line summary."""
+        stats = self.stats()
+        return (
+            f"describe {stats['describe']['utilization']:.0%} busy ({stats['describe']['workers']} workers), "
+            f"generate {stats['generate']['utilization']:.0%} busy ({stats['generate']['workers']} workers), "
+            f"queue {stats['queue_depth']}/{stats['queue_size']}"
+        )
@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+import random
+import threading
+from typing import Callable, Dict, Optional
+
+from openai import RateLimitError
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.metrics import metrics
+from config.settings import RATE_LIMITS, RATE_LIMIT_MAX_RETRIES
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Initialize the bucket.
+
+        Args:
+            per_minute (float): Tokens added per minute.
+            capacity (Optional[float]): Maximum burst size; defaults to one minute's worth.
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1) -> float:
+        """
+        Block until amount tokens are available, then take them.
+
+        Requests larger than the capacity are clamped so they can still proceed.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = max(self.blocked_until - now, (amount - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def block_for(self, seconds: float) -> None:
+        """Hold every caller for the given number of seconds, e.g. after a Retry-After response."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+class AdaptiveConcurrency:
+    """Concurrency limit adjusted by additive increase / multiplicative decrease (AIMD)."""
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 64):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, outcome: Optional[str] = "success") -> None:
+        """Free a slot; "success" grows the limit, "throttled" halves it, None leaves it unchanged."""
+        with self._condition:
+            self.in_flight -= 1
+            if outcome == "throttled":
+                self.limit = max(self.minimum, self.limit / 2)
+            elif outcome == "success":
+                # Grows by roughly one slot per full window of successful calls
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class RateLimiter:
+    """
+    Client-side limits for OpenAI calls, per model.
+
+    Each model can have requests/minute, tokens/minute and images/minute buckets plus an
+    AIMD concurrency limit. Calls that still get a 429 are retried after the server's
+    Retry-After delay (or jittered exponential backoff), and the model's buckets are
+    paused for every caller so the whole process backs off together.
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, float]], max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 60.0, initial_concurrency: int = 4):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            limits (Dict[str, Dict[str, float]]): Per-model limits, e.g.
+                {"gpt-4o": {"requests_per_minute": 500, "tokens_per_minute": 30000}}.
+            max_retries (int): Retries after a 429 before the error is raised.
+            base_delay (float): First backoff delay in seconds when no Retry-After is given.
+            max_delay (float): Upper bound for a single backoff delay.
+            initial_concurrency (int): Starting concurrency limit for each model.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.initial_concurrency = initial_concurrency
+        self.retries = 0
+        self._lock = threading.Lock()
+        self._models = {}
+        for model, model_limits in limits.items():
+            self._models[model] = self._create_model_state(model_limits)
+
+    def _create_model_state(self, model_limits: Dict[str, float]) -> dict:
+        return {
+            "requests": TokenBucket(model_limits["requests_per_minute"]) if "requests_per_minute" in model_limits else None,
+            "tokens": TokenBucket(model_limits["tokens_per_minute"]) if "tokens_per_minute" in model_limits else None,
+            "images": TokenBucket(model_limits["images_per_minute"]) if "images_per_minute" in model_limits else None,
+            "concurrency": AdaptiveConcurrency(initial=self.initial_concurrency),
+        }
+
+    def _model_state(self, model: str) -> dict:
+        with self._lock:
+            if model not in self._models:
+                self._models[model] = self._create_model_state({})
+            return self._models[model]
+
+    def concurrency_limit(self, model: str) -> int:
+        """Current adaptive concurrency limit for a model."""
+        return int(self._model_state(model)["concurrency"].limit)
+
+    @staticmethod
+    def _retry_after(error: RateLimitError) -> Optional[float]:
+        """Read the server's requested delay from a 429 response, if any."""
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            if "retry-after-ms" in headers:
+                return float(headers["retry-after-ms"]) / 1000
+            if "retry-after" in headers:
+                return float(headers["retry-after"])
+        except ValueError:
+            # Retry-After may also be an HTTP date; fall back to backoff
+            pass
+        return None
+
+    def call(self, model: str, func: Callable, tokens: float = 0, images: float = 0):
+        """
+        Call func once the model's limits allow it, retrying on rate limit errors.
+
+        Args:
+            model (str): Model the call is billed against.
+            func (Callable): Zero-argument function performing the API call.
+            tokens (float): Estimated tokens the call will consume.
+            images (float): Number of images the call will generate.
+
+        Returns:
+            The return value of func.
+        """
+        state = self._model_state(model)
+        for attempt in range(self.max_retries + 1):
+            if state["requests"] is not None:
+                state["requests"].acquire(1)
+            if tokens and state["tokens"] is not None:
+                state["tokens"].acquire(tokens)
+            if images and state["images"] is not None:
+                state["images"].acquire(images)
+
+            state["concurrency"].acquire()
+            outcome = None
+            try:
+                result = func()
+                outcome = "success"
+                return result
+            except RateLimitError as e:
+                if e.code == "insufficient_quota":
+                    # A billing problem rather than throttling: retrying cannot succeed
+                    raise
+                outcome = "throttled"
+                if attempt == self.max_retries:
+                    raise
+                retry_after = self._retry_after(e)
+                backoff = min(self.max_delay, self.base_delay * 2 ** attempt)
+                delay = retry_after if retry_after is not None else random.uniform(backoff / 2, backoff)
+                for bucket in (state["requests"], state["tokens"], state["images"]):
+                    if bucket is not None:
+                        bucket.block_for(delay)
+                with self._lock:
+                    self.retries += 1
+                metrics.increment("deghiblify_retries_total", model=model)
+            finally:
+                state["concurrency"].release(outcome)
+            time.sleep(delay)
+
+
+def create_rate_limiter() -> RateLimiter:
+    """Create a rate limiter with the per-model limits configured in config.settings."""
+    return RateLimiter(RATE_LIMITS, max_retries=RATE_LIMIT_MAX_RETRIES)
@@ -0,0 +1,126 @@
+import os
+import sys
+import uuid
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.cache import DiskCache
+from config.settings import (
+    RESULT_STORE_MEMORY_BYTES, RESULT_STORE_DIR, RESULT_STORE_DISK_BYTES, RESULT_STORE_TTL_SECONDS,
+)
+
+
+def record_size(record: dict) -> int:
+    """Approximate the memory held by a result record from its bytes and string fields, including lists of them (e.g. variants)."""
+    size = 0
+    for value in record.values():
+        if isinstance(value, (bytes, str)):
+            size += len(value)
+        elif isinstance(value, (list, tuple)):
+            size += sum(len(item) for item in value if isinstance(item, (bytes, str)))
+    return size
+
+
+class ResultStore:
+    """
+    Process-wide store for transformation results shared by all sessions.
+
+    Records stay in memory until the combined size of all records exceeds the memory
+    budget; the least recently used ones are then spilled to a disk store (itself
+    bounded by size and TTL) and loaded back on access. Sessions only keep entry IDs,
+    so reruns and downloads can re-render a result without another API call.
+    """
+
+    def __init__(self, memory_budget_bytes: int, spill_dir: str, max_spill_bytes: int,
+                 ttl_seconds: Optional[float] = None):
+        """
+        Initialize the result store.
+
+        Args:
+            memory_budget_bytes (int): Total size of records kept in memory across all sessions.
+            spill_dir (str): Directory for records evicted from memory.
+            max_spill_bytes (int): Maximum total size of spilled records before the oldest are dropped.
+            ttl_seconds (Optional[float]): Spilled records not accessed for this long are dropped.
+        """
+        self.memory_budget_bytes = memory_budget_bytes
+        self.memory_bytes = 0
+        self._entries = OrderedDict()
+        self._spill = DiskCache(spill_dir, max_bytes=max_spill_bytes, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+
+    def _add(self, entry_id: str, record: dict) -> None:
+        """Add a record to memory and spill least recently used records over the budget. Caller holds the lock."""
+        size = record_size(record)
+        self._entries[entry_id] = (record, size)
+        self.memory_bytes += size
+        # Always keep the newest record in memory, even if it alone exceeds the budget
+        while self.memory_bytes > self.memory_budget_bytes and len(self._entries) > 1:
+            spilled_id, (spilled, spilled_size) = self._entries.popitem(last=False)
+            self.memory_bytes -= spilled_size
+            self._spill.set(spilled_id, pickle.dumps(spilled, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def put(self, record: dict) -> str:
+        """
+        Store a result record.
+
+        Args:
+            record (dict): Result fields, e.g. original and result bytes, description and timings.
+
+        Returns:
+            str: Entry ID to keep in session state.
+        """
+        entry_id = uuid.uuid4().hex
+        with self._lock:
+            self._add(entry_id, record)
+        return entry_id
+
+    def get(self, entry_id: Optional[str]) -> Optional[dict]:
+        """
+        Return a stored record, loading it back into memory if it was spilled.
+
+        Args:
+            entry_id (Optional[str]): ID returned by put.
+
+        Returns:
+            Optional[dict]: The record, or None if it was never stored or has expired.
+        """
+        if entry_id is None:
+            return None
+        with self._lock:
+            item = self._entries.get(entry_id)
+            if item is not None:
+                self._entries.move_to_end(entry_id)
+                return item[0]
+
+            data = self._spill.get(entry_id)
+            if data is None:
+                return None
+            record = pickle.loads(data)
+            self._spill.delete(entry_id)
+            self._add(entry_id, record)
+            return record
+
+    def delete(self, entry_id: str) -> None:
+        """Remove a record from memory and disk."""
+        with self._lock:
+            item = self._entries.pop(entry_id, None)
+            if item is not None:
+                self.memory_bytes -= item[1]
+            self._spill.delete(entry_id)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def create_result_store() -> ResultStore:
+    """Create the session result store configured in config.settings."""
+    return ResultStore(
+        RESULT_STORE_MEMORY_BYTES,
+        RESULT_STORE_DIR,
+        max_spill_bytes=RESULT_STORE_DISK_BYTES,
+        ttl_seconds=RESULT_STORE_TTL_SECONDS
+    )
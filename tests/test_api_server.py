@@ -0,0 +1,127 @@
+import asyncio
+import struct
+import zlib
+from io import BytesIO
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from PIL import Image
+
+from benchmarks.mock_openai import MockOpenAIServer
+from src.api_server import create_app
+from src.async_openai_client import AsyncOpenAIClient
+
+
+def png_bytes(size=(64, 64)):
+    buffered = BytesIO()
+    Image.linear_gradient("L").resize(size).convert("RGB").save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def png_header(width, height):
+    """A PNG claiming the given size, with no pixel data; enough for header checks."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"")) + chunk(b"IEND", b""))
+
+
+@pytest.fixture(scope="module")
+def mock_openai():
+    with MockOpenAIServer(image_latency="fixed:0.3", image_side=64) as server:
+        yield server
+
+
+def run_with_client(mock_openai, test, **options):
+    """Run an async test against the service, backed by the mock OpenAI API and no caches."""
+    async def main():
+        app = create_app(AsyncOpenAIClient(api_key="mock", base_url=mock_openai.base_url), **options)
+        async with TestClient(TestServer(app)) as client:
+            await test(client)
+    asyncio.run(main())
+
+
+def test_submit_with_wait_returns_image(mock_openai):
+    async def test(client):
+        response = await client.post("/v1/transformations?wait=30", data=png_bytes())
+        assert response.status == 200
+        assert response.content_type == "image/png"
+        assert await response.read() == mock_openai.image
+
+    run_with_client(mock_openai, test)
+
+
+def test_submit_then_poll_and_fetch_image(mock_openai):
+    async def test(client):
+        response = await client.post("/v1/transformations", data=png_bytes())
+        assert response.status == 202
+        status = await response.json()
+        assert status["status"] in ("queued", "running")
+        assert response.headers["Location"] == f"/v1/transformations/{status['id']}"
+
+        early = await client.get(f"/v1/transformations/{status['id']}/image")
+        assert early.status == 409
+
+        response = await client.get(f"/v1/transformations/{status['id']}?wait=30")
+        assert response.status == 200
+        status = await response.json()
+        assert status["status"] == "done"
+        assert status["run_seconds"] > 0
+
+        image = await client.get(status["image_url"])
+        assert image.status == 200
+        assert await image.read() == mock_openai.image
+
+    run_with_client(mock_openai, test)
+
+
+def test_multipart_upload(mock_openai):
+    async def test(client):
+        response = await client.post("/v1/transformations?wait=30", data={"image": BytesIO(png_bytes())})
+        assert response.status == 200
+
+    run_with_client(mock_openai, test)
+
+
+def test_unknown_job_is_404(mock_openai):
+    async def test(client):
+        assert (await client.get("/v1/transformations/missing")).status == 404
+
+    run_with_client(mock_openai, test)
+
+
+def test_non_image_upload_is_415(mock_openai):
+    async def test(client):
+        response = await client.post("/v1/transformations", data=b"this is not an image")
+        assert response.status == 415
+
+    run_with_client(mock_openai, test)
+
+
+@pytest.mark.parametrize("width, height", [(9000, 9000), (20000, 20000)])
+def test_too_many_pixels_is_413(mock_openai, width, height):
+    async def test(client):
+        response = await client.post("/v1/transformations", data=png_header(width, height))
+        assert response.status == 413
+        assert "pixel" in await response.text()
+
+    run_with_client(mock_openai, test)
+
+
+def test_oversized_body_is_413(mock_openai):
+    async def test(client):
+        response = await client.post("/v1/transformations", data=png_bytes() + b"\0" * 2048)
+        assert response.status == 413
+
+    run_with_client(mock_openai, test, max_body_bytes=1024)
+
+
+def test_full_queue_is_503(mock_openai):
+    async def test(client):
+        first = await client.post("/v1/transformations", data=png_bytes())
+        assert first.status == 202
+        second = await client.post("/v1/transformations", data=png_bytes())
+        assert second.status == 503
+        assert second.headers["Retry-After"] == "5"
+
+    run_with_client(mock_openai, test, max_concurrency=1, max_pending=1)
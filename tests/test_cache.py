@@ -0,0 +1,106 @@
+import os
+import time
+
+from src.cache import DiskCache, MemoryCache, TieredCache, make_cache_key
+
+
+def age(cache, key, seconds):
+    """Backdate an entry's last access time."""
+    mtime = time.time() - seconds
+    os.utime(os.path.join(cache.directory, key), (mtime, mtime))
+
+
+def test_make_cache_key_depends_on_data_and_params():
+    key = make_cache_key(b"image", model="gpt-4o", quality="high")
+    assert key == make_cache_key(b"image", quality="high", model="gpt-4o")
+    assert key != make_cache_key(b"image", model="gpt-4o", quality="low")
+    assert key != make_cache_key(b"other", model="gpt-4o", quality="high")
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_items=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a")
+    cache.set("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
+    assert len(cache) == 2
+
+
+def test_disk_cache_round_trip(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    cache.set("key", b"value")
+    assert cache.get("key") == b"value"
+    cache.delete("key")
+    assert cache.get("key") is None
+    cache.delete("key")
+
+
+def test_disk_cache_evicts_least_recently_used_over_max_bytes(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=25)
+    cache.set("a", b"x" * 10)
+    cache.set("b", b"x" * 10)
+    age(cache, "a", 30)
+    age(cache, "b", 20)
+    # Reading a marks it as recently used, so b is now the oldest
+    assert cache.get("a") is not None
+    cache.set("c", b"x" * 10)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_disk_cache_evicts_until_under_limit(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=15)
+    for i, key in enumerate("abc"):
+        cache.set(key, b"x" * 5)
+        age(cache, key, 30 - i)
+    cache.set("d", b"x" * 12)
+    assert [key for key in "abcd" if cache.get(key) is not None] == ["d"]
+
+
+def test_disk_cache_keeps_entry_larger_than_limit_out(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=4)
+    cache.set("big", b"x" * 10)
+    assert cache.get("big") is None
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_disk_cache_expires_entries_after_ttl(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl_seconds=60)
+    cache.set("old", b"1")
+    cache.set("new", b"2")
+    age(cache, "old", 120)
+    assert cache.get("old") is None
+    assert not os.path.exists(os.path.join(str(tmp_path), "old"))
+    assert cache.get("new") == b"2"
+
+
+def test_disk_cache_eviction_drops_expired_entries(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl_seconds=60)
+    cache.set("old", b"1")
+    age(cache, "old", 120)
+    cache.set("new", b"2")
+    assert sorted(os.listdir(str(tmp_path))) == ["new"]
+
+
+def test_disk_cache_ignores_temporary_files(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1)
+    (tmp_path / ".tmp-partial").write_bytes(b"x" * 100)
+    cache.set("a", b"1")
+    assert cache.get("a") == b"1"
+    assert (tmp_path / ".tmp-partial").exists()
+
+
+def test_tiered_cache_promotes_disk_hits(tmp_path):
+    memory = MemoryCache(max_items=4)
+    disk = DiskCache(str(tmp_path))
+    cache = TieredCache(memory, disk)
+    disk.set("key", b"value")
+    assert memory.get("key") is None
+    assert cache.get("key") == b"value"
+    assert memory.get("key") == b"value"
+    cache.delete("key")
+    assert cache.get("key") is None
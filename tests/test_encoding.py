@@ -0,0 +1,84 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from src import encoding
+from src.cache import MemoryCache
+from src.encoding import ORIGINAL, ImageEncoder, available_formats
+
+
+def encode(format, size=(64, 48), **options):
+    buffered = BytesIO()
+    Image.linear_gradient("L").resize(size).convert("RGB").save(buffered, format=format, **options)
+    return buffered.getvalue()
+
+
+@pytest.fixture
+def encoder():
+    encoder = ImageEncoder(max_workers=2, cache=MemoryCache(max_items=8))
+    yield encoder
+    encoder.shutdown()
+
+
+def test_original_returns_the_same_bytes(encoder):
+    data = encode("PNG")
+    encoded = encoder.encode(data, format=ORIGINAL)
+    assert encoded.data is data
+    assert encoded.format == "PNG"
+    assert encoded.mime_type == "image/png"
+    assert encoded.extension == ".png"
+
+
+def test_lossless_source_in_requested_format_is_passed_through(encoder):
+    data = encode("PNG")
+    assert encoder.encode(data, format="png").data is data
+    assert len(encoder.cache) == 0
+
+
+def test_lossy_formats_are_always_encoded(encoder):
+    data = encode("JPEG", quality=95)
+    encoded = encoder.encode(data, format="JPEG", quality=50)
+    assert encoded.data is not data
+    assert Image.open(BytesIO(encoded.data)).format == "JPEG"
+
+
+def test_encoded_results_are_cached(encoder, monkeypatch):
+    calls = []
+    real_encode = encoder._encode
+
+    def counting_encode(*args):
+        calls.append(args[1:3])
+        return real_encode(*args)
+
+    monkeypatch.setattr(encoder, "_encode", counting_encode)
+    data = encode("PNG")
+    first = encoder.encode(data, format="WEBP", quality=80)
+    assert Image.open(BytesIO(first.data)).format == "WEBP"
+    assert first.mime_type == "image/webp"
+    assert encoder.encode(data, format="WEBP", quality=80).data == first.data
+    # A different quality is a different cache entry
+    encoder.encode(data, format="WEBP", quality=60)
+    assert calls == [("WEBP", 80), ("WEBP", 60)]
+
+
+def test_encode_many_keeps_order(encoder):
+    images = [encode("PNG", size=(32 + i, 32)) for i in range(5)]
+    results = encoder.encode_many(images, format="JPEG")
+    assert [Image.open(BytesIO(result.data)).size for result in results] == [(32 + i, 32) for i in range(5)]
+
+
+def test_unknown_format_is_rejected(encoder):
+    with pytest.raises(ValueError):
+        encoder.encode(encode("PNG"), format="BMP")
+
+
+def test_avif_falls_back_to_webp_when_unsupported(encoder, monkeypatch):
+    monkeypatch.setattr(encoding, "avif_supported", lambda: False)
+    assert ImageEncoder.resolve_format("avif") == "WEBP"
+    assert "AVIF" not in available_formats()
+    assert encoder.encode(encode("PNG"), format="AVIF").format == "WEBP"
+
+    monkeypatch.setattr(encoding, "avif_supported", lambda: True)
+    assert ImageEncoder.resolve_format("avif") == "AVIF"
+    assert "AVIF" in available_formats()
@@ -0,0 +1,106 @@
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.image_processor import ImageProcessor, ImageTooLarge, SourceImage
+
+
+def scene(size=(1600, 900), subject=(700, 250, 1000, 750), seed=0):
+    """A flat background with a textured, brightly coloured subject in the given box."""
+    rng = np.random.default_rng(seed)
+    pixels = np.full((size[1], size[0], 3), (90, 140, 200), dtype=np.uint8)
+    left, top, right, bottom = subject
+    pixels[top:bottom, left:right] = rng.integers(0, 256, (bottom - top, right - left, 3), dtype=np.uint8)
+    return Image.fromarray(pixels, "RGB")
+
+
+def encode(image, format="PNG", **options):
+    buffered = BytesIO()
+    image.save(buffered, format=format, **options)
+    return buffered.getvalue()
+
+
+def test_subject_region_finds_subject_in_wide_scene():
+    subject = (700, 250, 1000, 750)
+    box = ImageProcessor.subject_region(scene(subject=subject))
+    assert box is not None
+    left, top, right, bottom = box
+    # The box covers the subject (up to the trimmed saliency tails) and little else
+    assert left <= subject[0] + 30 and top <= subject[1] + 50
+    assert right >= subject[2] - 30 and bottom >= subject[3] - 50
+    assert (right - left) * (bottom - top) < 0.35 * 1600 * 900
+
+
+def test_subject_region_keeps_full_frame_when_subject_fills_it():
+    assert ImageProcessor.subject_region(scene(size=(400, 400), subject=(10, 10, 390, 390))) is None
+
+
+def test_subject_region_keeps_full_frame_for_flat_or_tiny_images():
+    assert ImageProcessor.subject_region(Image.new("RGB", (500, 300), (20, 30, 40))) is None
+    assert ImageProcessor.subject_region(scene(size=(12, 12), subject=(2, 2, 8, 8))) is None
+
+
+def test_vision_payload_is_cropped_to_subject():
+    image = scene()
+    payload = ImageProcessor.prepare_vision_payload(image, crop=True)
+    assert payload.crop_box == ImageProcessor.subject_region(image)
+    crop_width = payload.crop_box[2] - payload.crop_box[0]
+    crop_height = payload.crop_box[3] - payload.crop_box[1]
+    assert payload.size == ImageProcessor.vision_input_size((crop_width, crop_height))
+
+    full = ImageProcessor.prepare_vision_payload(image, crop=False)
+    assert full.crop_box is None
+    assert full.size == ImageProcessor.vision_input_size(image.size)
+
+
+def test_region_overlay_leaves_original_untouched():
+    image = scene(size=(300, 200), subject=(100, 50, 200, 150))
+    before = image.tobytes()
+    overlay = ImageProcessor.draw_region_overlay(image, (100, 50, 200, 150))
+    assert overlay.size == image.size
+    assert overlay.getpixel((100, 100)) == (139, 92, 246)
+    assert image.tobytes() == before
+
+
+def test_load_image_rejects_files_over_max_bytes(tmp_path):
+    path = tmp_path / "big.png"
+    path.write_bytes(encode(scene(size=(200, 200), subject=(0, 0, 200, 200))))
+    with pytest.raises(ImageTooLarge, match="byte limit"):
+        ImageProcessor.load_image(str(path), max_bytes=1000)
+    assert ImageProcessor.load_image(str(path), max_bytes=None).size == (200, 200)
+
+
+def test_load_image_rejects_too_many_pixels_before_decoding():
+    data = encode(Image.new("RGB", (400, 300)))
+    with pytest.raises(ImageTooLarge, match="400x300"):
+        ImageProcessor.load_image(BytesIO(data), max_pixels=100000)
+
+
+def test_load_image_turns_decompression_bombs_into_image_too_large(monkeypatch):
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    data = encode(Image.new("RGB", (100, 100)))
+    with pytest.raises(ImageTooLarge):
+        ImageProcessor.load_image(BytesIO(data), max_pixels=None)
+
+
+def test_load_image_reduces_large_images_to_max_side():
+    image = scene(size=(1600, 900))
+    for format in ("JPEG", "PNG"):
+        loaded = ImageProcessor.load_image(BytesIO(encode(image, format)), max_side=400)
+        assert max(loaded.size) == 400
+        assert loaded.format == format
+    assert ImageProcessor.load_image(BytesIO(encode(image, "JPEG")), max_side=None).size == (1600, 900)
+
+
+def test_source_image_checks_limits_from_header():
+    source = SourceImage.from_any(encode(Image.new("RGB", (400, 300))))
+    assert source.size == (400, 300)
+    source.check_limits(max_bytes=None, max_pixels=120000)
+    with pytest.raises(ImageTooLarge):
+        source.check_limits(max_bytes=None, max_pixels=119999)
+    with pytest.raises(ImageTooLarge):
+        source.check_limits(max_bytes=10, max_pixels=None)
+    # Only the header was read
+    assert source._image is None
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from src.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue, JobQueueFull
+
+
+def wait_finished(jobs, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get(job_id)
+        if job.finished:
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+@pytest.fixture
+def jobs():
+    jobs = JobQueue(max_workers=1, max_pending=3)
+    yield jobs
+    jobs.shutdown(wait=True)
+
+
+def test_job_runs_with_progress_and_result(jobs):
+    def work(value, progress):
+        progress("described")
+        return value * 2
+
+    job_id = jobs.submit(work, 21)
+    job = wait_finished(jobs, job_id)
+    assert job.status == DONE
+    assert job.result == 42
+    assert job.stage == "described"
+    assert job.run_seconds >= 0
+
+
+def test_failed_job_keeps_error(jobs):
+    def work(progress):
+        raise RuntimeError("boom")
+
+    job = wait_finished(jobs, jobs.submit(work))
+    assert job.status == FAILED
+    assert str(job.error) == "boom"
+
+
+def wait_running(jobs, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while jobs.get(job_id).status != RUNNING:
+        assert time.monotonic() < deadline, "job did not start"
+        time.sleep(0.01)
+
+
+def test_queued_jobs_report_position_and_full_queue(jobs):
+    release = threading.Event()
+    blocker = jobs.submit(lambda progress: release.wait(5))
+    wait_running(jobs, blocker)
+    second = jobs.submit(lambda progress: None)
+    third = jobs.submit(lambda progress: None)
+    try:
+        with pytest.raises(JobQueueFull):
+            jobs.submit(lambda progress: None)
+        assert jobs.get(second).status == QUEUED
+        assert jobs.position(blocker) == 0
+        assert jobs.position(second) == 0
+        assert jobs.position(third) == 1
+        assert jobs.stats()["queued"] == 2
+        assert jobs.stats()["running"] == 1
+    finally:
+        release.set()
+    for job_id in (blocker, second, third):
+        wait_finished(jobs, job_id)
+    assert jobs.stats()["running"] == 0
+
+
+def test_stage_timings_exclude_queue_wait(jobs):
+    release = threading.Event()
+    jobs.submit(lambda progress: release.wait(5))
+
+    def work(progress):
+        progress("described")
+        return progress.timings["described"]
+
+    job_id = jobs.submit(work)
+    time.sleep(0.3)
+    release.set()
+    job = wait_finished(jobs, job_id)
+    assert job.wait_seconds >= 0.3
+    assert job.result < 0.2
+
+
+def test_forget_only_drops_finished_jobs(jobs):
+    release = threading.Event()
+    job_id = jobs.submit(lambda progress: release.wait(5))
+    jobs.forget(job_id)
+    assert jobs.get(job_id) is not None
+    assert jobs.get(job_id).status in (QUEUED, RUNNING)
+    release.set()
+    wait_finished(jobs, job_id)
+    jobs.forget(job_id)
+    assert jobs.get(job_id) is None
+    assert jobs.get(None) is None
+
+
+def test_finished_jobs_expire_after_retention():
+    jobs = JobQueue(max_workers=1, retention_seconds=0)
+    try:
+        job_id = jobs.submit(lambda progress: None)
+        wait_finished(jobs, job_id)
+        jobs.submit(lambda progress: None)
+        assert jobs.get(job_id) is None
+    finally:
+        jobs.shutdown(wait=True)
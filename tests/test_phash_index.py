@@ -0,0 +1,171 @@
+import random
+
+import pytest
+
+from src.phash_index import PerceptualHashIndex, hamming_distance
+
+
+def flip_bits(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_hamming_distance():
+    assert hamming_distance(0b1011, 0b0001) == 2
+    assert hamming_distance(12345, 12345) == 0
+
+
+def test_exact_match_has_distance_zero():
+    index = PerceptualHashIndex(max_distance=4)
+    index.add(0xDEADBEEF, "key")
+    assert index.lookup(0xDEADBEEF) == ("key", 0)
+
+
+def test_finds_hash_within_max_distance_in_any_chunk():
+    index = PerceptualHashIndex(max_distance=4)
+    stored = 0x0123456789ABCDEF
+    index.add(stored, "key")
+    # Four flipped bits spread across the whole hash, so no chunk matches by luck alone
+    assert index.lookup(flip_bits(stored, (0, 17, 35, 63))) == ("key", 4)
+    assert index.lookup(flip_bits(stored, (0, 1, 2, 3))) == ("key", 4)
+
+
+def test_misses_hash_beyond_max_distance():
+    index = PerceptualHashIndex(max_distance=4)
+    stored = 0x0123456789ABCDEF
+    index.add(stored, "key")
+    assert index.lookup(flip_bits(stored, (0, 13, 26, 39, 52))) is None
+
+
+def test_returns_closest_match():
+    index = PerceptualHashIndex(max_distance=4)
+    query = 0x0F0F0F0F0F0F0F0F
+    index.add(flip_bits(query, (1, 20, 40)), "far")
+    index.add(flip_bits(query, (60,)), "near")
+    assert index.lookup(query) == ("near", 1)
+
+
+def test_per_query_threshold():
+    index = PerceptualHashIndex(max_distance=4)
+    index.add(0, "key")
+    assert index.lookup(flip_bits(0, (5, 50)), max_distance=1) is None
+    assert index.lookup(flip_bits(0, (5, 50)), max_distance=2) == ("key", 2)
+    with pytest.raises(ValueError):
+        index.lookup(0, max_distance=5)
+
+
+def test_adding_same_hash_replaces_value():
+    index = PerceptualHashIndex(max_distance=2)
+    index.add(42, "old")
+    index.add(42, "new")
+    assert len(index) == 1
+    assert index.lookup(flip_bits(42, (9,))) == ("new", 1)
+
+
+def test_invalid_max_distance():
+    with pytest.raises(ValueError):
+        PerceptualHashIndex(max_distance=64, hash_bits=64)
+
+
+def test_matches_linear_scan():
+    rng = random.Random(0)
+    index = PerceptualHashIndex(max_distance=6)
+    stored = [rng.getrandbits(64) for _ in range(500)]
+    for i, value in enumerate(stored):
+        index.add(value, i)
+
+    for _ in range(200):
+        base = rng.choice(stored)
+        query = flip_bits(base, rng.sample(range(64), rng.randint(0, 8)))
+        expected = min(hamming_distance(query, value) for value in stored)
+        result = index.lookup(query)
+        if expected > 6:
+            assert result is None
+        else:
+            assert result is not None
+            assert result[1] == expected
+            assert hamming_distance(query, stored[result[0]]) == expected
+
+
+def test_find_returns_matching_hash():
+    index = PerceptualHashIndex(max_distance=4)
+    stored = flip_bits(0, (3,))
+    index.add(stored, "key")
+    assert index.find(0) == (stored, "key", 1)
+    assert index.find(flip_bits(0, (10, 20, 30, 40, 50))) is None
+
+
+def test_remove_uncovers_next_closest_match():
+    index = PerceptualHashIndex(max_distance=4)
+    index.add(flip_bits(0, (1,)), "stale")
+    index.add(flip_bits(0, (2, 3)), "live")
+    index.remove(flip_bits(0, (1,)))
+    assert len(index) == 1
+    assert index.lookup(0) == ("live", 2)
+    index.remove(flip_bits(0, (2, 3)))
+    index.remove(12345)
+    assert index.lookup(0) is None
+    assert all(not table for table in index._tables)
+
+
+def test_max_entries_drops_least_recently_used():
+    index = PerceptualHashIndex(max_distance=2, max_entries=2)
+    index.add(1 << 10, "a")
+    index.add(1 << 30, "b")
+    # Matching a marks it as recently used, so b is dropped next
+    assert index.lookup(1 << 10) == ("a", 0)
+    index.add(1 << 50, "c")
+    assert len(index) == 2
+    assert index.lookup(1 << 30, max_distance=0) is None
+    assert index.lookup(1 << 10) == ("a", 0)
+
+
+def test_log_file_restores_index(tmp_path):
+    path = str(tmp_path / "index.log")
+    index = PerceptualHashIndex(max_distance=4, path=path)
+    index.add(0x0123456789ABCDEF, "first")
+    index.add(0xFEDCBA9876543210, "second")
+    index.add(0x0123456789ABCDEF, "replaced")
+    index.remove(0xFEDCBA9876543210)
+    index.add(42, "third")
+
+    restored = PerceptualHashIndex(max_distance=4, path=path)
+    assert len(restored) == 2
+    assert restored.lookup(0x0123456789ABCDEF) == ("replaced", 0)
+    assert restored.lookup(0xFEDCBA9876543210) is None
+    assert restored.lookup(flip_bits(42, (60,))) == ("third", 1)
+    # Loading compacts the log to one line per live entry
+    assert len(open(path).read().splitlines()) == 2
+
+
+def test_log_file_respects_max_entries_and_skips_damaged_lines(tmp_path):
+    path = tmp_path / "index.log"
+    path.write_text("1 a\n2 b\nzz broken\n3 c\n4")
+    restored = PerceptualHashIndex(max_distance=0, max_entries=2, path=str(path))
+    assert len(restored) == 2
+    assert restored.lookup(1) is None
+    assert restored.lookup(2) == ("b", 0)
+    assert restored.lookup(3) == ("c", 0)
+
+
+def test_client_drops_stale_near_duplicates(tmp_path):
+    from PIL import Image
+    from src.cache import MemoryCache
+    from src.image_processor import ImageProcessor, SourceImage
+    from src.openai_client import OpenAIClient
+
+    image = Image.linear_gradient("L").convert("RGB")
+    source = SourceImage.from_any(image)
+    image_hash = ImageProcessor.perceptual_hash(image)
+    cache = MemoryCache()
+    index = PerceptualHashIndex(max_distance=4)
+    index.add(image_hash, "expired-key")
+    index.add(flip_bits(image_hash, (7, 40)), "live-key")
+    cache.set("live-key", b"generated")
+
+    client = OpenAIClient(api_key="test", cache=cache, near_duplicate_index=index)
+    cached, _, _ = client._lookup_result(source)
+    assert cached == b"generated"
+    assert len(index) == 1
+    assert index.lookup(image_hash) == ("live-key", 2)
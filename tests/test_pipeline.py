@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+from src.batch import main as batch_main
+from src.pipeline import PipelineExecutor
+
+
+class FakeClient:
+    """Stands in for OpenAIClient's stage methods; inputs are image bytes tagged by name."""
+
+    def __init__(self, cached=(), fail_describe=(), fail_generate=()):
+        self.cached = set(cached)
+        self.fail_describe = set(fail_describe)
+        self.fail_generate = set(fail_generate)
+        self.stored = {}
+        self._lock = threading.Lock()
+
+    def _lookup_result(self, source):
+        name = bytes(source.data).decode()
+        return (b"cached-" + name.encode() if name in self.cached else None), name, None
+
+    def _describe(self, source):
+        name = bytes(source.data).decode()
+        if name in self.fail_describe:
+            raise RuntimeError(f"describe failed for {name}")
+        return f"description of {name}"
+
+    def generate_from_description(self, description):
+        name = description.rsplit(" ", 1)[-1]
+        if name in self.fail_generate:
+            raise RuntimeError(f"generate failed for {name}")
+        return b"generated-" + name.encode()
+
+    def _store_result(self, cache_key, image_hash, generated_image):
+        with self._lock:
+            self.stored[cache_key] = generated_image
+
+
+def run(executor, names):
+    return {bytes(result.input_path).decode(): result for result in executor.run([name.encode() for name in names])}
+
+
+def test_every_input_yields_one_result():
+    client = FakeClient()
+    executor = PipelineExecutor(client, describe_workers=3, generate_workers=2, queue_size=2)
+    names = [f"image{i}" for i in range(20)]
+    results = run(executor, names)
+    assert sorted(results) == sorted(names)
+    for name, result in results.items():
+        assert result.error is None
+        assert result.output == b"generated-" + name.encode()
+        assert result.description == f"description of {name}"
+    assert client.stored == {name: b"generated-" + name.encode() for name in names}
+    stats = executor.stats()
+    assert stats["describe"]["items"] == 20
+    assert stats["generate"]["items"] == 20
+
+
+def test_cached_inputs_skip_both_stages():
+    client = FakeClient(cached={"a"})
+    results = run(PipelineExecutor(client, describe_workers=1, generate_workers=1), ["a", "b"])
+    assert results["a"].cached
+    assert results["a"].output == b"cached-a"
+    assert not results["b"].cached
+    assert list(client.stored) == ["b"]
+
+
+def test_stage_errors_are_reported_per_input():
+    client = FakeClient(fail_describe={"a"}, fail_generate={"b"})
+    results = run(PipelineExecutor(client, describe_workers=2, generate_workers=2), ["a", "b", "c"])
+    assert "describe failed" in str(results["a"].error)
+    assert "generate failed" in str(results["b"].error)
+    assert results["b"].description == "description of b"
+    assert results["c"].output == b"generated-c"
+
+
+@pytest.mark.parametrize("options", [
+    {"describe_workers": 0},
+    {"generate_workers": 0},
+    {"generate_workers": -1},
+    {"queue_size": 0},
+])
+def test_rejects_empty_stages(options):
+    with pytest.raises(ValueError):
+        PipelineExecutor(FakeClient(), **options)
+
+
+@pytest.mark.parametrize("option", ["--describe-workers", "--generate-workers", "--queue-size"])
+def test_batch_cli_rejects_counts_below_one(option, tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        batch_main([str(tmp_path), option, "0"])
+    assert exit_info.value.code == 2
+    assert "must be at least 1" in capsys.readouterr().err
@@ -0,0 +1,238 @@
+import threading
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from src import rate_limiter
+from src.rate_limiter import AdaptiveConcurrency, RateLimiter, TokenBucket
+
+
+class FakeClock:
+    """Stands in for the time module: sleep advances monotonic instead of waiting."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+def rate_limit_error(headers=None, code=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/images/edits")
+    response = httpx.Response(429, headers=headers or {}, request=request)
+    return RateLimitError("rate limited", response=response, body={"code": code} if code else None)
+
+
+def test_bucket_allows_burst_up_to_capacity(clock):
+    bucket = TokenBucket(per_minute=60, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert clock.sleeps == []
+
+
+def test_bucket_blocks_until_refilled(clock):
+    bucket = TokenBucket(per_minute=60, capacity=2)
+    bucket.acquire(2)
+    # One token per second, so two more tokens take two seconds
+    assert bucket.acquire(2) == pytest.approx(2.0)
+    assert clock.now == pytest.approx(1002.0)
+
+
+def test_bucket_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(per_minute=60, capacity=2)
+    bucket.acquire(2)
+    clock.now += 600
+    bucket.acquire(2)
+    assert bucket.tokens == pytest.approx(0.0)
+    assert bucket.acquire(1) == pytest.approx(1.0)
+
+
+def test_bucket_clamps_requests_larger_than_capacity(clock):
+    bucket = TokenBucket(per_minute=60, capacity=5)
+    assert bucket.acquire(50) == 0.0
+    assert bucket.tokens == pytest.approx(0.0)
+
+
+def test_block_for_holds_callers_and_drains_bucket(clock):
+    bucket = TokenBucket(per_minute=6000, capacity=100)
+    bucket.block_for(5)
+    assert bucket.acquire(1) >= 5.0
+    assert clock.now >= 1005.0
+
+
+def test_block_for_never_shortens_an_existing_block(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.block_for(10)
+    bucket.block_for(2)
+    assert bucket.blocked_until == pytest.approx(1010.0)
+
+
+def test_concurrency_success_grows_additively():
+    concurrency = AdaptiveConcurrency(initial=4, maximum=64)
+    expected = 4.0
+    for _ in range(12):
+        concurrency.acquire()
+        concurrency.release("success")
+        expected += 1 / expected
+    assert concurrency.limit == pytest.approx(expected)
+    # Roughly one extra slot per full window of successes
+    assert int(concurrency.limit) == 6
+
+
+def test_concurrency_throttle_halves_down_to_minimum():
+    concurrency = AdaptiveConcurrency(initial=16, minimum=2)
+    for expected in (8, 4, 2, 2):
+        concurrency.acquire()
+        concurrency.release("throttled")
+        assert concurrency.limit == expected
+
+
+def test_concurrency_growth_is_capped_at_maximum():
+    concurrency = AdaptiveConcurrency(initial=3, maximum=3)
+    concurrency.acquire()
+    concurrency.release("success")
+    assert concurrency.limit == 3
+
+
+def test_concurrency_release_without_outcome_keeps_limit():
+    concurrency = AdaptiveConcurrency(initial=4)
+    concurrency.acquire()
+    concurrency.release(None)
+    assert concurrency.limit == 4
+    assert concurrency.in_flight == 0
+
+
+def test_concurrency_blocks_callers_over_the_limit():
+    concurrency = AdaptiveConcurrency(initial=1)
+    concurrency.acquire()
+    acquired = threading.Event()
+
+    def worker():
+        concurrency.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    assert not acquired.wait(0.1)
+    concurrency.release(None)
+    assert acquired.wait(5)
+    thread.join(5)
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "250"}, 0.25),
+    ({"retry-after": "3"}, 3.0),
+    ({"retry-after": "1.5", "retry-after-ms": "800"}, 0.8),
+    ({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}, None),
+    ({}, None),
+])
+def test_retry_after_parsing(headers, expected):
+    assert RateLimiter._retry_after(rate_limit_error(headers)) == expected
+
+
+def test_call_retries_after_retry_after_delay(clock):
+    limiter = RateLimiter({"gpt-4o": {"requests_per_minute": 6000}}, max_retries=3, initial_concurrency=4)
+    responses = [rate_limit_error({"retry-after": "7"}), "ok"]
+
+    def func():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert limiter.call("gpt-4o", func) == "ok"
+    assert limiter.retries == 1
+    assert clock.sleeps[0] == pytest.approx(7.0)
+    # The throttle halved the limit; the later success only grows it by 1/limit
+    assert limiter.concurrency_limit("gpt-4o") == 2
+
+
+def test_call_pauses_every_bucket_for_the_model(clock):
+    limiter = RateLimiter({"gpt-4o": {"requests_per_minute": 6000, "tokens_per_minute": 60000}}, max_retries=1)
+    calls = []
+
+    def func():
+        calls.append(clock.now)
+        if len(calls) == 1:
+            raise rate_limit_error({"retry-after": "4"})
+        return "ok"
+
+    start = clock.now
+    assert limiter.call("gpt-4o", func, tokens=10) == "ok"
+    assert calls[1] - start >= 4.0
+    state = limiter._model_state("gpt-4o")
+    assert state["requests"].blocked_until == pytest.approx(start + 4.0)
+    assert state["tokens"].blocked_until == pytest.approx(start + 4.0)
+
+
+def test_call_uses_jittered_backoff_without_retry_after(clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda low, high: high)
+    limiter = RateLimiter({}, max_retries=3, base_delay=1.0, max_delay=3.0)
+    attempts = []
+
+    def func():
+        attempts.append(1)
+        if len(attempts) <= 3:
+            raise rate_limit_error()
+        return "ok"
+
+    assert limiter.call("dall-e-3", func) == "ok"
+    # Exponential backoff 1, 2, 4 capped at max_delay
+    assert clock.sleeps == [1.0, 2.0, 3.0]
+    assert limiter.retries == 3
+
+
+def test_call_raises_after_max_retries(clock):
+    limiter = RateLimiter({}, max_retries=2)
+    attempts = []
+
+    def func():
+        attempts.append(1)
+        raise rate_limit_error({"retry-after": "1"})
+
+    with pytest.raises(RateLimitError):
+        limiter.call("gpt-4o", func)
+    assert len(attempts) == 3
+    assert limiter.retries == 2
+
+
+def test_call_does_not_retry_insufficient_quota(clock):
+    limiter = RateLimiter({"gpt-4o": {"requests_per_minute": 6000}}, max_retries=5, initial_concurrency=4)
+    attempts = []
+
+    def func():
+        attempts.append(1)
+        raise rate_limit_error({"retry-after": "20"}, code="insufficient_quota")
+
+    with pytest.raises(RateLimitError):
+        limiter.call("gpt-4o", func)
+    assert len(attempts) == 1
+    assert clock.sleeps == []
+    assert limiter.retries == 0
+    assert limiter.concurrency_limit("gpt-4o") == 4
+    assert limiter._model_state("gpt-4o")["requests"].blocked_until == 0.0
+
+
+def test_call_does_not_retry_other_errors(clock):
+    limiter = RateLimiter({}, max_retries=5, initial_concurrency=4)
+
+    def func():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        limiter.call("gpt-4o", func)
+    assert limiter.retries == 0
+    assert limiter.concurrency_limit("gpt-4o") == 4
+    assert limiter._model_state("gpt-4o")["concurrency"].in_flight == 0
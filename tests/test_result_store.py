@@ -0,0 +1,96 @@
+import os
+import time
+
+from src.result_store import ResultStore, record_size
+
+
+def make_record(name, size):
+    return {"original": b"o" * size, "description": name}
+
+
+def test_record_size_counts_bytes_strings_and_variants():
+    record = {"original": b"x" * 1000, "description": "abc", "variants": [b"y" * 500, b"z" * 500], "seconds": 1.5}
+    assert record_size(record) == 2003
+
+
+def test_records_within_budget_stay_in_memory(tmp_path):
+    store = ResultStore(memory_budget_bytes=1000, spill_dir=str(tmp_path), max_spill_bytes=10000)
+    first = store.put(make_record("a", 100))
+    second = store.put(make_record("b", 100))
+    assert len(store) == 2
+    assert store.memory_bytes == 202
+    assert os.listdir(str(tmp_path)) == []
+    assert store.get(first)["description"] == "a"
+    assert store.get(second)["description"] == "b"
+
+
+def test_least_recently_used_record_spills_and_loads_back(tmp_path):
+    store = ResultStore(memory_budget_bytes=250, spill_dir=str(tmp_path), max_spill_bytes=10000)
+    first = store.put(make_record("a", 100))
+    second = store.put(make_record("b", 100))
+    # Reading first makes second the least recently used
+    store.get(first)
+    third = store.put(make_record("c", 100))
+    assert len(store) == 2
+    assert store.memory_bytes == 202
+    assert os.listdir(str(tmp_path)) == [second]
+
+    record = store.get(second)
+    assert record == make_record("b", 100)
+    # Loading it back spills first, the least recently used record now
+    assert second not in os.listdir(str(tmp_path))
+    assert os.listdir(str(tmp_path)) == [first]
+    assert store.get(third)["description"] == "c"
+
+
+def test_newest_record_stays_in_memory_even_over_budget(tmp_path):
+    store = ResultStore(memory_budget_bytes=50, spill_dir=str(tmp_path), max_spill_bytes=10000)
+    first = store.put(make_record("a", 100))
+    assert len(store) == 1
+    second = store.put(make_record("b", 100))
+    assert len(store) == 1
+    assert os.listdir(str(tmp_path)) == [first]
+    assert store.get(second)["description"] == "b"
+
+
+def test_spilled_records_are_bounded_by_disk_size(tmp_path):
+    store = ResultStore(memory_budget_bytes=1, spill_dir=str(tmp_path), max_spill_bytes=300)
+    ids = []
+    for i in range(6):
+        ids.append(store.put(make_record(str(i), 100)))
+        if i:
+            mtime = time.time() - 100 + i
+            os.utime(os.path.join(str(tmp_path), ids[i - 1]), (mtime, mtime))
+    spilled = os.listdir(str(tmp_path))
+    assert 0 < len(spilled) < 5
+    assert ids[0] not in spilled
+    assert store.get(ids[0]) is None
+    assert store.get(ids[-1])["description"] == "5"
+
+
+def test_spilled_records_expire_after_ttl(tmp_path):
+    store = ResultStore(memory_budget_bytes=150, spill_dir=str(tmp_path), max_spill_bytes=10000, ttl_seconds=60)
+    first = store.put(make_record("a", 100))
+    store.put(make_record("b", 100))
+    mtime = time.time() - 120
+    os.utime(os.path.join(str(tmp_path), first), (mtime, mtime))
+    assert store.get(first) is None
+
+
+def test_delete_removes_record_from_memory_and_disk(tmp_path):
+    store = ResultStore(memory_budget_bytes=150, spill_dir=str(tmp_path), max_spill_bytes=10000)
+    first = store.put(make_record("a", 100))
+    second = store.put(make_record("b", 100))
+    store.delete(first)
+    store.delete(second)
+    assert store.get(first) is None
+    assert store.get(second) is None
+    assert store.memory_bytes == 0
+    assert len(store) == 0
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_get_unknown_id_returns_none(tmp_path):
+    store = ResultStore(memory_budget_bytes=100, spill_dir=str(tmp_path), max_spill_bytes=100)
+    assert store.get(None) is None
+    assert store.get("missing") is None